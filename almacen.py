@@ -0,0 +1,142 @@
+import atexit
+import json
+import mmap
+import os
+import tempfile
+from array import array
+
+# Campos grandes que solo se usan al generar el contexto de los productos seleccionados
+# ('fragmento' es el bloque de contexto ya renderizado del producto)
+CAMPOS_FRIOS = ('descripcion', 'detalle_prod', 'beneficios', 'recomendaciones_uso',
+                'dosis_tabla', 'presentacion', 'url', 'variantes', 'fragmento')
+
+# Carpeta para los archivos del almacén (por defecto la carpeta temporal del sistema)
+CARPETA_ALMACEN = os.environ.get('ALMACEN_DIR') or None
+
+# Archivos que el sistema no permitió borrar mientras estaban abiertos (Windows)
+_pendientes_borrar = []
+
+
+@atexit.register
+def _borrar_pendientes():
+    for ruta in _pendientes_borrar:
+        try:
+            os.unlink(ruta)
+        except OSError:
+            pass
+
+
+class AlmacenFrio:
+    """Campos de texto grandes en un archivo mapeado en memoria, decodificados bajo demanda"""
+
+    __slots__ = ('_datos', '_mmap', '_desplazamientos')
+
+    def __init__(self, datos, desplazamientos):
+        self._desplazamientos = desplazamientos
+        self._mmap = None
+        self._datos = datos
+        if not datos:
+            return
+
+        # Se escribe a un archivo y se mapea: las páginas las maneja el sistema operativo,
+        # se comparten entre workers y no cuentan como memoria propia del proceso.
+        descriptor, ruta = tempfile.mkstemp(prefix='tia-almacen-', suffix='.bin', dir=CARPETA_ALMACEN)
+        try:
+            with os.fdopen(descriptor, 'w+b') as f:
+                f.write(datos)
+                f.flush()
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            try:
+                os.unlink(ruta)  # El mapeo sigue vivo aunque el archivo ya no tenga nombre
+            except OSError:
+                _pendientes_borrar.append(ruta)
+        self._datos = self._mmap
+
+    @classmethod
+    def construir(cls, productos):
+        """Serializar los campos fríos de cada producto (un valor JSON por producto y campo)"""
+        partes = []
+        desplazamientos = array('q', [0])
+        total = 0
+        for producto in productos:
+            for campo in CAMPOS_FRIOS:
+                valor = json.dumps(producto.get(campo), ensure_ascii=False).encode('utf-8')
+                partes.append(valor)
+                total += len(valor)
+                desplazamientos.append(total)
+        return cls(b''.join(partes), desplazamientos)
+
+    def leer(self, id_producto, campo):
+        """Decodificar un campo frío de un producto"""
+        posicion = id_producto * len(CAMPOS_FRIOS) + CAMPOS_FRIOS.index(campo)
+        inicio, fin = self._desplazamientos[posicion], self._desplazamientos[posicion + 1]
+        return json.loads(self._datos[inicio:fin].decode('utf-8'))
+
+    def __len__(self):
+        return len(self._datos) if self._datos else 0
+
+    def __reduce__(self):
+        # En el snapshot se guardan los bytes; al cargarlo se vuelve a mapear un archivo
+        return (AlmacenFrio, (bytes(self._datos or b''), self._desplazamientos))
+
+
+class Producto:
+    """Producto del catálogo: campos de ranking en memoria, textos grandes en el almacén frío"""
+
+    __slots__ = ('id', 'nombre', 'precio', 'rating', 'fuentes', '_almacen')
+
+    CAMPOS_CALIENTES = ('id', 'nombre', 'precio', 'rating', 'fuentes')
+
+    def __init__(self, id_producto, nombre, precio, rating, fuentes, almacen):
+        self.id = id_producto
+        self.nombre = nombre
+        self.precio = precio
+        self.rating = rating
+        self.fuentes = fuentes
+        self._almacen = almacen
+
+    def get(self, campo, defecto=None):
+        """Leer un campo como en un dict (los campos fríos se decodifican al pedirlos)"""
+        if campo in CAMPOS_FRIOS:
+            valor = self._almacen.leer(self.id, campo)
+        elif campo in self.CAMPOS_CALIENTES:
+            valor = getattr(self, campo)
+        else:
+            valor = None
+        return defecto if valor is None else valor
+
+    def __getitem__(self, campo):
+        valor = self.get(campo)
+        if valor is None:
+            raise KeyError(campo)
+        return valor
+
+    def __contains__(self, campo):
+        return self.get(campo) is not None
+
+    def __getstate__(self):
+        return tuple(getattr(self, campo) for campo in self.__slots__)
+
+    def __setstate__(self, estado):
+        for campo, valor in zip(self.__slots__, estado):
+            setattr(self, campo, valor)
+
+    def __repr__(self):
+        return f'Producto({self.id}, {self.nombre!r})'
+
+
+def construir_almacen(productos):
+    """Convertir los productos fusionados (dicts) en registros compactos con almacén frío"""
+    almacen = AlmacenFrio.construir(productos)
+    return [
+        Producto(
+            id_producto,
+            producto.get('nombre', 'Sin nombre'),
+            producto.get('precio'),
+            producto.get('rating'),
+            tuple(producto.get('fuentes', ())),
+            almacen
+        )
+        for id_producto, producto in enumerate(productos)
+    ]
@@ -0,0 +1,88 @@
+# Analizador de español: palabras vacías, raíces (stemming ligero) y sinónimos del dominio
+import re
+from functools import lru_cache
+
+# Palabras que no aportan a la búsqueda
+PALABRAS_VACIAS = frozenset('''
+a al algo algun alguna algunas alguno algunos ante antes bien buen buena buenas bueno
+buenos busco cada como con contra cual cuales cuando de del desde donde dos e el ella
+ellas ellos en entre era es esa esas ese eso esos esta estan estas este esto estos hay
+hola las le les lo los me mi mis mucho muy necesito ni no nos o otra otras otro otros
+para pero poco por porque puede pueden que quien quiero se ser si sin sobre son su sus
+tambien te tengo tiene tienen tienes todo todos tu tus un una unas uno unos usted y ya yo
+'''.split())
+
+# Grupos de sinónimos del dominio (se amplían con la variable de entorno SINONIMOS).
+# Solo palabras equivalentes: con palabras relacionadas pero más raras ("pan" / "panaderia")
+# el sinónimo tiene más idf que la palabra buscada y termina dominando el ranking.
+SINONIMOS_POR_DEFECTO = [
+    ('mejorante', 'mejorador'),
+    ('antiadherente', 'desmoldante'),
+    ('conservador', 'conservante'),
+    ('blanqueador', 'blanqueante'),
+    ('kilo', 'kg', 'kilogramo'),
+    ('litro', 'lt')
+]
+
+# Peso de un sinónimo frente a la palabra escrita en la consulta
+PESO_SINONIMO = 0.5
+
+PATRON_PALABRA = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=65536)
+def raiz(palabra):
+    """Raíz de una palabra: quita el plural y la vocal final de género (tortillas -> tortill)"""
+    if len(palabra) <= 3 or not palabra.isalpha():
+        return palabra
+
+    if palabra.endswith('ces'):
+        palabra = palabra[:-3] + 'z'          # luces -> luz
+    elif palabra.endswith('ones'):
+        palabra = palabra[:-2]                # porciones -> porcion
+    elif palabra.endswith('es') and palabra[-3] in 'lrndzj':
+        palabra = palabra[:-2]                # conservadores -> conservador, panes -> pan
+    elif palabra.endswith('s') and palabra[-2] in 'aeiou':
+        palabra = palabra[:-1]                # tortillas -> tortilla
+
+    if len(palabra) > 4 and palabra[-1] in 'aoe':
+        palabra = palabra[:-1]                # tortilla / tortillo -> tortill
+    return palabra
+
+
+def analizar(texto):
+    """Raíces de las palabras de un texto ya normalizado, sin palabras vacías"""
+    return [
+        raiz(palabra) for palabra in PATRON_PALABRA.findall(texto)
+        if palabra not in PALABRAS_VACIAS and (len(palabra) > 1 or palabra.isdigit())
+    ]
+
+
+def leer_sinonimos(texto):
+    """Grupos de sinónimos por defecto más los de 'a,b;c,d' (cada grupo separado por ';')"""
+    grupos = list(SINONIMOS_POR_DEFECTO)
+    for parte in (texto or '').split(';'):
+        grupo = tuple(palabra.strip() for palabra in parte.split(',') if palabra.strip())
+        if len(grupo) > 1:
+            grupos.append(grupo)
+    return grupos
+
+
+def construir_mapa_sinonimos(grupos):
+    """Precalcular raíz -> raíces sinónimas, a partir de grupos de palabras"""
+    mapa = {}
+    for grupo in grupos:
+        raices = list(dict.fromkeys(termino for palabra in grupo for termino in analizar(palabra)))
+        for termino in raices:
+            otros = [otro for otro in raices if otro != termino]
+            mapa[termino] = tuple(dict.fromkeys(mapa.get(termino, ()) + tuple(otros)))
+    return mapa
+
+
+def expandir(terminos, mapa_sinonimos):
+    """Agregar a los términos de la consulta sus sinónimos: [(término, peso)] sin repetir"""
+    expandidos = dict.fromkeys(terminos, 1.0)
+    for termino in terminos:
+        for sinonimo in mapa_sinonimos.get(termino, ()):
+            expandidos.setdefault(sinonimo, PESO_SINONIMO)
+    return list(expandidos.items())
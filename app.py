@@ -1,241 +1,462 @@
+import hmac
 import json
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
-from difflib import SequenceMatcher
 import logging
-import re
+import os
+import threading
+import time
+from indice import construir_indice_busqueda, leer_pesos_campos
+from normalizacion import normalizar
+from analizador import leer_sinonimos
+from motores import MOTORES, MOTOR_POR_DEFECTO
+from cache import CacheRespuestas
+from metricas import metricas
+from bitacora import configurar_logging, sortear_detalle, detalle, truncar
+from recarga import VigilanteArchivos, fechas_modificacion
+from fusion import fusionar_catalogos, agrupar_por_fuente
+from snapshot import metadatos_snapshot, cargar_snapshot
+from almacen import construir_almacen
+from dosis import construir_indice_dosis, buscar_dosis
+from filtros import construir_facetas, filtrar, tamanos, FUENTES
+from faq import leer_json, construir_indice_faq, buscar_intenciones, contexto_intenciones
+from contexto import renderizar_fragmentos, seleccionar_partes, unir_fragmentos, recortar_respuesta, estimar_tokens, CARACTERES_POR_TOKEN
 
-# Configurar logging detallado
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configurar logging (escritura en un hilo aparte; LOG_FORMATO=json para JSON lines)
+configurar_logging()
 logger = logging.getLogger(__name__)
 
 # Crear la instancia de Flask
 app = Flask(__name__)
 CORS(app)  # Habilitar CORS
 
-# Variables globales para almacenar los datos JSON
-productos_combined = []
-productos_meli = []
-productos_page = []
+# Cache de respuestas de /consultar (LRU + TTL), se invalida al recargar catálogos
+cache_respuestas = CacheRespuestas(
+    max_entradas=int(os.environ.get('CACHE_MAX_ENTRADAS', 1024)),
+    ttl_segundos=float(os.environ.get('CACHE_TTL_SEGUNDOS', 300))
+)
+
+# Límite de productos por consulta
+LIMITE_POR_DEFECTO = 5
+MAX_LIMITE = 20
+
+# Máximo de mensajes por petición en /consultar/batch
+MAX_BATCH = int(os.environ.get('MAX_BATCH', 50))
+
+# Pesos de campos para BM25F (ej. BM25_PESOS="nombre:3,descripcion:1.5,otros:1")
+PESOS_BM25 = leer_pesos_campos(os.environ.get('BM25_PESOS'))
+
+# Sinónimos del dominio además de los por defecto (ej. SINONIMOS="mejorante,mejorador;pan,panaderia")
+SINONIMOS = leer_sinonimos(os.environ.get('SINONIMOS'))
+
+# Archivos JSON de productos por fuente
+ARCHIVOS_CATALOGO = {
+    'combined': 'combined.json',
+    'meli': 'prod_meli.json',
+    'page': 'prod_page.json'
+}
+
+# Preguntas frecuentes e información de la empresa (respuestas rápidas y contexto general)
+ARCHIVOS_INFORMACION = {
+    'respuestas': 'respuestas.json',
+    'empresa': 'empresa.json'
+}
+
+# respuestas.json y empresa.json todavía traen datos de plantilla de otra empresa: las respuestas
+# rápidas y el contexto general armado con ellos se activan con FAQ_ACTIVO=1 cuando tengan los
+# datos de TIA. Mientras tanto toda consulta busca productos y el respaldo es el contexto fijo de TIA.
+FAQ_ACTIVO = os.environ.get('FAQ_ACTIVO', '0') == '1'
+
+# Archivos que se vigilan y cuyas huellas invalidan el snapshot
+ARCHIVOS_VIGILADOS = list(ARCHIVOS_CATALOGO.values()) + list(ARCHIVOS_INFORMACION.values())
+
+# Revisar cambios en los archivos cada N segundos (0 = desactivado)
+RECARGA_INTERVALO_SEGUNDOS = float(os.environ.get('RECARGA_INTERVALO_SEGUNDOS', 0))
+
+# Snapshot binario compilado con `python snapshot.py` (vacío = no usar snapshot)
+RUTA_SNAPSHOT = os.environ.get('CATALOGO_SNAPSHOT', 'catalogo.snapshot')
+
+# Token para POST /admin/recargar (si no se define, el endpoint queda desactivado)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+def construir_catalogo_vacio():
+    """Catálogo sin productos (antes de la primera carga)"""
+    return {
+        'version': 0,
+        'productos': [],
+        'conteos': {fuente: 0 for fuente in ARCHIVOS_CATALOGO},
+        'dosis': construir_indice_dosis([]),
+        'indice': construir_indice_busqueda([], PESOS_BM25, SINONIMOS),
+        'facetas': construir_facetas([]),
+        'faq': construir_indice_faq({}, {}),
+        'fechas_modificacion': {},
+        'cargado_en': None
+    }
+
+# Catálogo actual: productos + índices. Se reemplaza completo (nunca se modifica)
+# para que las peticiones en curso no vean un catálogo a medio cargar.
+catalogo = construir_catalogo_vacio()
+lock_recarga = threading.Lock()
+
+def leer_archivo_json(ruta):
+    """Leer un archivo JSON de productos (lista vacía si no existe)"""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            productos = json.load(f)
+        logger.info(f"✅ {ruta} cargado: {len(productos)} productos")
+        return productos
+    except FileNotFoundError:
+        logger.warning(f"⚠️ {ruta} no encontrado")
+        return []
+
+def construir_catalogo():
+    """Leer los archivos JSON y construir un catálogo nuevo con sus índices"""
+    # Las fechas se toman antes de leer: si un archivo cambia mientras se lee, habrá otra recarga
+    fechas = fechas_modificacion(ARCHIVOS_VIGILADOS)
+    
+    productos = {
+        fuente: leer_archivo_json(ruta)
+        for fuente, ruta in ARCHIVOS_CATALOGO.items()
+    }
+    nuevo = indexar_catalogo(
+        productos,
+        leer_json(ARCHIVOS_INFORMACION['respuestas']),
+        leer_json(ARCHIVOS_INFORMACION['empresa'])
+    )
+    nuevo['fechas_modificacion'] = fechas
+    return nuevo
+
+def indexar_catalogo(productos, respuestas, empresa):
+    """Construir el catálogo y sus índices a partir de los productos ya leídos ({fuente: lista})"""
+    # Un registro por producto con todas sus variantes (combined + page + MercadoLibre)
+    fusionados = fusionar_catalogos(productos['combined'], productos['page'], productos['meli'])
+    logger.info(f"✅ Catálogos fusionados: {len(fusionados)} productos únicos")
+    
+    # Bloque de contexto de cada producto, renderizado una vez y guardado con sus campos fríos
+    for producto, fragmento in zip(fusionados, renderizar_fragmentos(fusionados)):
+        producto['fragmento'] = fragmento
+    
+    # Registros compactos: campos de ranking en memoria, textos grandes en el almacén mapeado
+    fusionados = construir_almacen(fusionados)
+    
+    # Normalizar e indexar una sola vez los textos de búsqueda
+    indice = construir_indice_busqueda(agrupar_por_fuente(fusionados), PESOS_BM25, SINONIMOS)
+    logger.info(f"✅ Índice de búsqueda construido: {len(indice['registros'])} registros, {len(indice['invertido']['vocabulario'])} términos")
+    
+    return {
+        'productos': fusionados,
+        # De los JSON originales solo se guardan los conteos
+        'conteos': {fuente: len(lista) for fuente, lista in productos.items()},
+        # Ingrediente -> filas de dosis_tabla (preguntas de cantidades)
+        'dosis': construir_indice_dosis(fusionados),
+        'indice': indice,
+        # Filtros (precio, rating, fuente, presentación) por id de registro del índice
+        'facetas': construir_facetas(indice['registros']),
+        # Palabras clave -> respuestas frecuentes, y el contexto general (sin productos)
+        'faq': construir_indice_faq(respuestas, empresa) if FAQ_ACTIVO else construir_indice_faq({}, {}),
+        'fechas_modificacion': {},
+        'cargado_en': time.time()
+    }
+
+def metadatos_catalogo():
+    """Huellas de los JSON, del código de indexación y de la configuración del catálogo"""
+    return metadatos_snapshot(ARCHIVOS_VIGILADOS, {'pesos_bm25': PESOS_BM25, 'sinonimos': SINONIMOS, 'faq_activo': FAQ_ACTIVO})
+
+def leer_snapshot_vigente():
+    """Cargar el catálogo desde el snapshot binario si corresponde a los JSON actuales"""
+    if not RUTA_SNAPSHOT:
+        return None
+    
+    fechas = fechas_modificacion(ARCHIVOS_VIGILADOS)
+    nuevo = cargar_snapshot(RUTA_SNAPSHOT, metadatos_catalogo())
+    if nuevo is None:
+        return None
+    
+    # Fechas actuales (no las de compilación) para que el vigilante no recargue de nuevo
+    nuevo['fechas_modificacion'] = fechas
+    nuevo['cargado_en'] = time.time()
+    logger.info(f"⚡ Catálogo cargado desde snapshot {RUTA_SNAPSHOT}: {len(nuevo['productos'])} productos únicos")
+    return nuevo
 
 def cargar_archivos_json():
-    """Cargar los 3 archivos JSON de productos"""
-    global productos_combined, productos_meli, productos_page
+    """Cargar los 3 archivos JSON de productos y reemplazar el catálogo actual"""
+    global catalogo
     
-    try:
-        # Cargar combined.json
+    with lock_recarga:
+        fechas = fechas_modificacion(ARCHIVOS_VIGILADOS)
         try:
-            with open('combined.json', 'r', encoding='utf-8') as f:
-                productos_combined = json.load(f)
-            logger.info(f"✅ combined.json cargado: {len(productos_combined)} productos")
-        except FileNotFoundError:
-            logger.warning("⚠️ combined.json no encontrado")
-            productos_combined = []
+            nuevo = leer_snapshot_vigente() or construir_catalogo()
+        except Exception as e:
+            # Si falla la carga se conserva el catálogo anterior; el vigilante no reintenta
+            # con los mismos archivos (solo cuando vuelvan a cambiar)
+            logger.error(f"❌ Error cargando archivos JSON: {e}")
+            vigilante_catalogos.registrar_fallo(fechas)
+            return False
+        vigilante_catalogos.registrar_fallo(None)
         
-        # Cargar prod_meli.json
-        try:
-            with open('prod_meli.json', 'r', encoding='utf-8') as f:
-                productos_meli = json.load(f)
-            logger.info(f"✅ prod_meli.json cargado: {len(productos_meli)} productos")
-        except FileNotFoundError:
-            logger.warning("⚠️ prod_meli.json no encontrado")
-            productos_meli = []
+        nuevo['version'] = catalogo['version'] + 1
+        catalogo = nuevo  # Reemplazo atómico
         
-        # Cargar prod_page.json
-        try:
-            with open('prod_page.json', 'r', encoding='utf-8') as f:
-                productos_page = json.load(f)
-            logger.info(f"✅ prod_page.json cargado: {len(productos_page)} productos")
-        except FileNotFoundError:
-            logger.warning("⚠️ prod_page.json no encontrado")
-            productos_page = []
-            
-    except Exception as e:
-        logger.error(f"❌ Error cargando archivos JSON: {e}")
-
-def limpiar_texto(texto):
-    """Limpiar y normalizar texto para búsqueda"""
-    texto = texto.lower()
-    # Remover acentos
-    texto = re.sub(r'[áàäâ]', 'a', texto)
-    texto = re.sub(r'[éèëê]', 'e', texto)
-    texto = re.sub(r'[íìïî]', 'i', texto)
-    texto = re.sub(r'[óòöô]', 'o', texto)
-    texto = re.sub(r'[úùüû]', 'u', texto)
-    texto = re.sub(r'[ñ]', 'n', texto)
-    return texto.strip()
-
-def similarity(a, b):
-    """Calcular similitud entre dos strings"""
-    return SequenceMatcher(None, limpiar_texto(a), limpiar_texto(b)).ratio()
-
-def buscar_por_palabras_clave(mensaje_lower, producto):
-    """Buscar coincidencias por palabras clave específicas"""
-    score = 0
-    
-    # Palabras clave importantes
-    palabras_mensaje = mensaje_lower.split()
-    
-    # Campos donde buscar
-    campos_busqueda = [
-        producto.get('nombre', ''),
-        producto.get('descripcion', ''),
-        producto.get('detalle_prod', ''),
-        producto.get('beneficios', ''),
-        ' '.join(producto.get('categorias', [])) if isinstance(producto.get('categorias'), list) else ''
-    ]
+        # Las respuestas guardadas corresponden al catálogo anterior
+        cache_respuestas.invalidar()
+        logger.info(f"✅ Catálogo versión {nuevo['version']} activo")
+        return True
+
+def recargar_en_segundo_plano():
+    """Recargar los catálogos en un hilo aparte; False si ya hay una recarga en curso"""
+    if lock_recarga.locked():
+        return False
+    threading.Thread(target=cargar_archivos_json, name='recarga-catalogos', daemon=True).start()
+    return True
+
+vigilante_catalogos = VigilanteArchivos(
+    lambda: catalogo['fechas_modificacion'],
+    ARCHIVOS_VIGILADOS,
+    RECARGA_INTERVALO_SEGUNDOS,
+    recargar_en_segundo_plano
+)
+
+def buscar_productos_relevantes(mensaje, limite=LIMITE_POR_DEFECTO, motor=None, catalogo_actual=None, permitidos=None):
+    """Buscar productos relevantes según el mensaje del cliente (solo entre 'permitidos', si se indica)"""
+    mensaje_lower = normalizar(mensaje)
+    motor = motor or MOTOR_POR_DEFECTO
+    indice_busqueda = (catalogo_actual or catalogo)['indice']
+    registros = indice_busqueda['registros']
+    
+    detalle(logger, f"🔍 Buscando productos para: '{truncar(mensaje)}' (motor: {motor})")
     
-    texto_completo = ' '.join(campos_busqueda).lower()
-    
-    # Buscar cada palabra del mensaje
-    for palabra in palabras_mensaje:
-        if len(palabra) > 3:  # Solo palabras significativas
-            palabra_limpia = limpiar_texto(palabra)
-            
-            # Coincidencia exacta en nombre = alto score
-            if palabra_limpia in limpiar_texto(producto.get('nombre', '')):
-                score += 2.0
-            
-            # Coincidencia en descripción
-            elif palabra_limpia in limpiar_texto(producto.get('descripcion', '')):
-                score += 1.0
-            
-            # Coincidencia en otros campos
-            elif palabra_limpia in limpiar_texto(texto_completo):
-                score += 0.5
-    
-    return score
-
-def buscar_productos_relevantes(mensaje, limite=5):
-    """Buscar productos relevantes según el mensaje del cliente"""
-    mensaje_lower = limpiar_texto(mensaje)
     productos_encontrados = []
+    for id_producto, score in MOTORES[motor](indice_busqueda, mensaje_lower, limite, permitidos):
+        registro = registros[id_producto]
+        productos_encontrados.append({
+            'producto': registro['producto'],
+            'score': score,
+            'fuente': registro['fuente']
+        })
     
-    logger.info(f"🔍 Buscando productos para: '{mensaje}'")
+    # Los motores ya devuelven solo los 'limite' mejores, ordenados por score
+    detalle(logger, f"✅ Encontrados {len(productos_encontrados)} productos únicos relevantes")
     
-    # Buscar en productos_combined
-    for producto in productos_combined:
-        score = 0
-        
-        # Búsqueda por similitud en nombre
-        nombre_similarity = similarity(mensaje_lower, producto.get('nombre', ''))
-        if nombre_similarity > 0.3:
-            score += nombre_similarity * 3  # Peso alto al nombre
-        
-        # Búsqueda por similitud en descripción
-        desc_similarity = similarity(mensaje_lower, producto.get('descripcion', ''))
-        if desc_similarity > 0.2:
-            score += desc_similarity * 1.5
-        
-        # Búsqueda por palabras clave
-        keyword_score = buscar_por_palabras_clave(mensaje_lower, producto)
-        score += keyword_score
-        
-        if score > 0.5:  # Umbral mínimo más alto
-            productos_encontrados.append({
-                'producto': producto,
-                'score': score,
-                'fuente': 'combined'
-            })
+    return productos_encontrados
+
+def agregar_dosis(productos, coincidencias, catalogo_actual, limite):
+    """Adjuntar las filas de dosis a los productos ya ordenados, sin cambiar su orden
+
+    Los productos que solo se encontraron por su tabla de dosis ocupan los
+    lugares que queden libres hasta 'limite'.
+    """
+    filas = {id_producto: filas_producto for id_producto, _, filas_producto in coincidencias}
+    resultado = [
+        dict(item, dosis=filas.pop(item['producto'].id)) if item['producto'].id in filas else item
+        for item in productos
+    ]
     
-    # Buscar en productos_page
-    for producto in productos_page:
-        score = 0
-        
-        nombre_similarity = similarity(mensaje_lower, producto.get('nombre', ''))
-        if nombre_similarity > 0.3:
-            score += nombre_similarity * 3
-        
-        desc_similarity = similarity(mensaje_lower, producto.get('descripcion', ''))
-        if desc_similarity > 0.2:
-            score += desc_similarity * 1.5
-        
-        keyword_score = buscar_por_palabras_clave(mensaje_lower, producto)
-        score += keyword_score
-        
-        if score > 0.5:
-            productos_encontrados.append({
+    for id_producto, encontradas, filas_producto in coincidencias:
+        if len(resultado) >= limite:
+            break
+        if id_producto in filas:
+            producto = catalogo_actual['productos'][id_producto]
+            resultado.append({
                 'producto': producto,
-                'score': score,
-                'fuente': 'page'
+                'score': encontradas,
+                'fuente': producto.fuentes[0],
+                'dosis': filas_producto
             })
     
-    # Ordenar por score y eliminar duplicados por nombre
-    productos_encontrados.sort(key=lambda x: x['score'], reverse=True)
+    return resultado
+
+def generar_contexto_optimizado(productos, presupuesto=None, limite=LIMITE_POR_DEFECTO):
+    """Generar contexto resumido y optimizado con productos; devuelve (contexto, productos incluidos)
+
+    Sin presupuesto se muestran los 'limite' mejores productos completos; con
+    un presupuesto (en caracteres) se agregan productos y campos por score
+    hasta llenarlo.
+    """
+    # Los bloques se renderizan al cargar el catálogo; solo se decodifican los de estos productos
+    productos = productos[:limite]
+    seleccion = seleccionar_partes(productos, presupuesto)
+    return unir_fragmentos(seleccion), [item for item, _ in seleccion]
+
+def buscar_contexto_productos(mensaje, mensaje_normalizado, limite, motor, actual, presupuesto, filtros):
+    """Buscar los productos de una consulta y armar su contexto
+
+    Devuelve (productos encontrados, productos incluidos en el contexto, contexto).
+    """
+    # Los filtros reducen los candidatos antes de puntuar
+    permitidos = filtrar(actual['facetas'], filtros)
     
-    # Eliminar duplicados basándose en nombres similares
-    productos_unicos = []
-    nombres_vistos = set()
+    # Buscar productos relevantes
+    with metricas.medir('tia_etapa_segundos', etapa='busqueda'):
+        productos_relevantes = buscar_productos_relevantes(mensaje, limite=limite, motor=motor, catalogo_actual=actual, permitidos=permitidos)
     
-    for item in productos_encontrados:
-        nombre = limpiar_texto(item['producto'].get('nombre', ''))
-        if nombre not in nombres_vistos:
-            nombres_vistos.add(nombre)
-            productos_unicos.append(item)
+    # Preguntas de cantidades: búsqueda directa en las tablas de dosis
+    with metricas.medir('tia_etapa_segundos', etapa='dosis'):
+        coincidencias_dosis = buscar_dosis(actual['dosis'], mensaje_normalizado)
+    if permitidos is not None and coincidencias_dosis:
+        registros = actual['indice']['registros']
+        productos_permitidos = {registros[id_registro]['producto'].id for id_registro in permitidos}
+        coincidencias_dosis = [c for c in coincidencias_dosis if c[0] in productos_permitidos]
+    if coincidencias_dosis:
+        detalle(logger, f"⚖️ Dosis encontradas en {len(coincidencias_dosis)} productos")
+        productos_relevantes = agregar_dosis(productos_relevantes, coincidencias_dosis, actual, limite)
     
-    resultado = productos_unicos[:limite]
-    logger.info(f"✅ Encontrados {len(resultado)} productos únicos relevantes")
+    # Generar contexto optimizado
+    with metricas.medir('tia_etapa_segundos', etapa='contexto'):
+        contexto, productos_contexto = generar_contexto_optimizado(productos_relevantes, presupuesto=presupuesto, limite=limite)
     
-    return resultado
+    return productos_relevantes, productos_contexto, contexto
 
-def generar_contexto_optimizado(productos):
-    """Generar contexto resumido y optimizado con productos"""
-    if not productos:
-        return ""
+def procesar_consulta(mensaje, limite=LIMITE_POR_DEFECTO, motor=None, catalogo_actual=None, presupuesto=None, filtros=None):
+    """Buscar productos y generar la respuesta de una consulta (con cache)"""
+    motor = motor or MOTOR_POR_DEFECTO
+    actual = catalogo_actual or catalogo
+    mensaje_normalizado = normalizar(mensaje)
+    # La versión del catálogo en la clave evita guardar resultados de un catálogo ya reemplazado
+    clave = (actual['version'], mensaje_normalizado, limite, motor, presupuesto, tuple(sorted((filtros or {}).items())))
     
-    contexto_partes = ["=== PRODUCTOS RELEVANTES ===\n"]
+    respuesta = cache_respuestas.obtener(clave)
+    if respuesta is not None:
+        detalle(logger, f"⚡ Respuesta desde cache para: '{truncar(mensaje)}'")
+        metricas.contar('tia_consultas_total', origen='cache')
+        return dict(respuesta, mensaje_original=mensaje)
     
-    for idx, item in enumerate(productos[:5], 1):  # Top 5 productos
-        producto = item['producto']
-        
-        contexto_partes.append(f"{idx}. PRODUCTO: {producto.get('nombre', 'Sin nombre')}")
-        
-        # Precio (si existe)
-        if 'precio' in producto and producto['precio']:
-            precio = producto['precio']
-            # Manejar diferentes formatos de precio
-            if isinstance(precio, (int, float)):
-                contexto_partes.append(f"   💰 Precio: ${precio:,.2f} MXN")
-            else:
-                contexto_partes.append(f"   💰 Precio: {precio}")
-        
-        # Descripción corta
-        descripcion = producto.get('descripcion', '')[:200]
-        if descripcion:
-            contexto_partes.append(f"   📝 {descripcion}...")
-        
-        # Beneficios (si existen)
-        beneficios = producto.get('beneficios', '')[:150]
-        if beneficios:
-            contexto_partes.append(f"   ✨ Beneficios: {beneficios}...")
-        
-        # Detalles (si existen)
-        detalles = producto.get('detalle_prod', '')[:150]
-        if detalles:
-            contexto_partes.append(f"   🔍 Detalles: {detalles}...")
-        
-        # Presentación (si existe)
-        presentacion = producto.get('presentacion', '')
-        if presentacion:
-            contexto_partes.append(f"   📦 Presentación: {presentacion}")
+    # Preguntas generales (horarios, contacto, pagos...): respuesta directa, sin puntuar productos
+    with metricas.medir('tia_etapa_segundos', etapa='faq'):
+        intenciones = [] if filtros else buscar_intenciones(actual['faq'], mensaje_normalizado)
+    metricas.contar('tia_consultas_total', origen='faq' if intenciones else 'productos')
+    if intenciones:
+        detalle(logger, f"💡 Pregunta frecuente: {', '.join(intenciones)}", intenciones=intenciones)
+        productos_relevantes = productos_contexto = []
+        contexto = contexto_intenciones(actual['faq'], intenciones)
+        if presupuesto is not None:
+            contexto = recortar_respuesta(contexto, presupuesto)
+    else:
+        productos_relevantes, productos_contexto, contexto = buscar_contexto_productos(mensaje, mensaje_normalizado, limite, motor, actual, presupuesto, filtros)
+    
+    # Si no se encontró nada específico, dar información general
+    if not intenciones and not productos_relevantes:
+        contexto = actual['faq']['general'] if presupuesto is None else recortar_respuesta(actual['faq']['general'], presupuesto)
+    
+    # Presupuesto menor que la primera línea (cabecera de producto, respuesta o título):
+    # contexto vacío, sin reemplazarlo por un texto que no responde la consulta
+    presupuesto_insuficiente = not contexto
+    if presupuesto_insuficiente:
+        detalle(logger, f"⚠️ Presupuesto de {presupuesto} caracteres insuficiente para '{truncar(mensaje)}'")
+    
+    detalle(
+        logger, f"✅ Contexto generado: {len(contexto)} caracteres, {len(productos_contexto)} productos en el contexto",
+        contexto_caracteres=len(contexto), productos_encontrados=len(productos_contexto)
+    )
+    
+    respuesta = {
+        'contexto': contexto,
+        # Productos que aparecen en el contexto (con presupuesto pueden ser menos que los encontrados)
+        'productos_encontrados': len(productos_contexto),
+        'contexto_caracteres': len(contexto),
+        'contexto_tokens_estimados': estimar_tokens(contexto),
+        'intenciones': intenciones,
+        'presupuesto_insuficiente': presupuesto_insuficiente,
+        'status': 'success',
+        'motor': motor
+    }
+    cache_respuestas.guardar(clave, respuesta)
+    
+    return dict(respuesta, mensaje_original=mensaje)
+
+def procesar_lote(mensajes, limite=LIMITE_POR_DEFECTO, motor=None, presupuesto=None, filtros=None):
+    """Procesar varias consultas contra el mismo catálogo, resolviendo una vez cada mensaje repetido"""
+    actual = catalogo
+    resultados = []
+    por_mensaje = {}
+    
+    for mensaje in mensajes:
+        if not isinstance(mensaje, str) or not mensaje.strip():
+            resultados.append({
+                'error': 'El mensaje no puede estar vacío',
+                'status': 'error',
+                'mensaje_original': mensaje
+            })
+            continue
         
-        contexto_partes.append("")  # Línea en blanco entre productos
+        mensaje = mensaje.strip()
+        normalizado = normalizar(mensaje)
+        if normalizado not in por_mensaje:
+            por_mensaje[normalizado] = procesar_consulta(mensaje, limite, motor, catalogo_actual=actual, presupuesto=presupuesto, filtros=filtros)
+        resultados.append(dict(por_mensaje[normalizado], mensaje_original=mensaje))
+    
+    detalle(logger, f"📦 Lote procesado: {len(mensajes)} mensajes, {len(por_mensaje)} distintos", mensajes=len(mensajes), distintos=len(por_mensaje))
+    return resultados
+
+def leer_opciones_busqueda(data):
+    """Validar 'motor' y 'limite' de la petición; devuelve (motor, limite, error)"""
+    motor = data.get('motor') or MOTOR_POR_DEFECTO
+    if not isinstance(motor, str):
+        return None, None, f'El campo "motor" debe ser un texto. Opciones: {", ".join(MOTORES)}'
+    if motor not in MOTORES:
+        return None, None, f'Motor de búsqueda desconocido: "{motor}". Opciones: {", ".join(MOTORES)}'
+    
+    limite = data.get('limite', LIMITE_POR_DEFECTO)
+    if not isinstance(limite, int) or isinstance(limite, bool) or not 1 <= limite <= MAX_LIMITE:
+        return None, None, f'El campo "limite" debe ser un entero entre 1 y {MAX_LIMITE}'
+    
+    return motor, limite, None
+
+def leer_filtros(data):
+    """Validar los filtros opcionales de la petición; devuelve (filtros, error)"""
+    filtros = {}
+    
+    for campo in ('precio_min', 'precio_max', 'rating_min'):
+        if campo not in data:
+            continue
+        valor = data[campo]
+        if not isinstance(valor, (int, float)) or isinstance(valor, bool) or valor < 0:
+            return None, f'El campo "{campo}" debe ser un número mayor o igual a 0'
+        filtros[campo] = float(valor)
+    
+    if filtros.get('precio_min', 0) > filtros.get('precio_max', float('inf')):
+        return None, 'El campo "precio_min" no puede ser mayor que "precio_max"'
     
-    return "\n".join(contexto_partes)
+    if 'fuente' in data:
+        if data['fuente'] not in FUENTES:
+            return None, f'Fuente desconocida: "{data["fuente"]}". Opciones: {", ".join(FUENTES)}'
+        filtros['fuente'] = data['fuente']
+    
+    if 'presentacion' in data:
+        tamano = tamanos(data['presentacion']) if isinstance(data['presentacion'], str) else set()
+        if len(tamano) != 1:
+            return None, 'El campo "presentacion" debe ser un tamaño, por ejemplo "5 kg" o "1 litro"'
+        filtros['presentacion'] = tamano.pop()
+    
+    return filtros or None, None
+
+def leer_presupuesto(data):
+    """Validar 'max_caracteres' o 'max_tokens' de la petición; devuelve (presupuesto en caracteres, error)"""
+    if 'max_caracteres' in data and 'max_tokens' in data:
+        return None, 'Indicar solo uno de "max_caracteres" o "max_tokens"'
+    
+    for campo, caracteres_por_unidad in (('max_caracteres', 1), ('max_tokens', CARACTERES_POR_TOKEN)):
+        if campo not in data:
+            continue
+        valor = data[campo]
+        if not isinstance(valor, int) or isinstance(valor, bool) or valor < 1:
+            return None, f'El campo "{campo}" debe ser un entero positivo'
+        return valor * caracteres_por_unidad, None
+    
+    return None, None
 
 @app.route('/consultar', methods=['POST'])
 def consultar():
     """
     Endpoint principal para recibir consultas de n8n y devolver contexto relevante
     """
+    inicio = time.perf_counter()
     try:
         # Obtener el mensaje del cliente
-        data = request.get_json()
+        with metricas.medir('tia_etapa_segundos', etapa='json'):
+            data = request.get_json()
         
-        logger.info(f"📨 Petición recibida: {data}")
+        if sortear_detalle():
+            detalle(logger, f"📨 Petición recibida: {truncar(data)}")
         
         if not data:
             logger.warning("⚠️ No se recibió JSON")
@@ -257,107 +478,208 @@ def consultar():
                 'error': 'El mensaje no puede estar vacío'
             }), 400
         
-        logger.info(f"💬 Procesando consulta: '{mensaje}'")
+        motor, limite, error = leer_opciones_busqueda(data)
+        if not error:
+            presupuesto, error = leer_presupuesto(data)
+        if not error:
+            filtros, error = leer_filtros(data)
+        if error:
+            logger.warning(f"⚠️ {error}")
+            return jsonify({
+                'error': error
+            }), 400
         
-        # Buscar productos relevantes
-        productos_relevantes = buscar_productos_relevantes(mensaje)
+        detalle(logger, f"💬 Procesando consulta: '{truncar(mensaje)}'")
         
-        # Generar contexto optimizado
-        contexto = generar_contexto_optimizado(productos_relevantes)
+        respuesta = procesar_consulta(mensaje, limite, motor, presupuesto=presupuesto, filtros=filtros)
         
-        # Si no se encontró nada específico, dar información general
-        if not contexto.strip():
-            contexto = """=== INFORMACIÓN GENERAL TIA ===
-
-Somos TIA (Tecnología en Ingredientes Alimenticios, S.A de C.V), empresa 100% mexicana.
-
-🏭 NUESTROS PRODUCTOS:
-• Mejoradores para tortillas y pan
-• Conservadores para mayor vida útil
-• Productos antiadherentes
-• Aditivos especializados para panadería
-• Insumos para tortillería
-
-💡 Para ayudarte mejor, por favor especifica:
-- ¿Qué tipo de producto buscas?
-- ¿Para qué aplicación? (tortillas, pan, etc.)
-- ¿Tienes alguna necesidad específica?"""
+        with metricas.medir('tia_etapa_segundos', etapa='jsonify'):
+            cuerpo = jsonify(respuesta)
+        duracion = time.perf_counter() - inicio
+        metricas.observar('tia_etapa_segundos', duracion, etapa='total')
         
-        logger.info(f"✅ Contexto generado: {len(contexto)} caracteres, {len(productos_relevantes)} productos encontrados")
+        detalle(
+            logger, "📤 Enviando respuesta exitosa",
+            motor=motor, limite=limite, productos_encontrados=respuesta['productos_encontrados'],
+            contexto_caracteres=respuesta['contexto_caracteres'], duracion_ms=round(duracion * 1000, 2)
+        )
+        return cuerpo, 200
         
-        respuesta = {
-            'contexto': contexto,
-            'productos_encontrados': len(productos_relevantes),
-            'status': 'success',
-            'mensaje_original': mensaje
-        }
+    except Exception as e:
+        logger.error(f"❌ Error en /consultar: {e}", exc_info=True)
+        return jsonify({
+            'error': f'Error interno del servidor: {str(e)}',
+            'status': 'error'
+        }), 500
+
+@app.route('/consultar/batch', methods=['POST'])
+def consultar_batch():
+    """
+    Consultar varios mensajes en una sola petición (flujos masivos de n8n)
+    """
+    sortear_detalle()
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data, dict):
+            logger.warning("⚠️ No se recibió JSON")
+            return jsonify({
+                'error': 'No se recibió un JSON válido'
+            }), 400
+        
+        mensajes = data.get('messages')
+        if not isinstance(mensajes, list) or not mensajes:
+            logger.warning("⚠️ Falta el campo 'messages'")
+            return jsonify({
+                'error': 'El campo "messages" debe ser una lista de mensajes'
+            }), 400
+        
+        if len(mensajes) > MAX_BATCH:
+            logger.warning(f"⚠️ Lote demasiado grande: {len(mensajes)}")
+            return jsonify({
+                'error': f'Máximo {MAX_BATCH} mensajes por petición'
+            }), 400
+        
+        motor, limite, error = leer_opciones_busqueda(data)
+        if not error:
+            presupuesto, error = leer_presupuesto(data)
+        if not error:
+            filtros, error = leer_filtros(data)
+        if error:
+            logger.warning(f"⚠️ {error}")
+            return jsonify({
+                'error': error
+            }), 400
         
-        logger.info(f"📤 Enviando respuesta exitosa")
+        resultados = procesar_lote(mensajes, limite, motor, presupuesto, filtros)
         
-        return jsonify(respuesta), 200
+        return jsonify({
+            'resultados': resultados,
+            'total': len(resultados),
+            'status': 'success'
+        }), 200
         
     except Exception as e:
-        logger.error(f"❌ Error en /consultar: {e}", exc_info=True)
+        logger.error(f"❌ Error en /consultar/batch: {e}", exc_info=True)
         return jsonify({
             'error': f'Error interno del servidor: {str(e)}',
             'status': 'error'
         }), 500
 
+@app.route('/admin/recargar', methods=['POST'])
+def admin_recargar():
+    """Recargar los catálogos JSON sin reiniciar el servidor"""
+    if not ADMIN_TOKEN or not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), ADMIN_TOKEN.encode()):
+        logger.warning("⚠️ Intento de recarga sin token válido")
+        return jsonify({
+            'error': 'No autorizado',
+            'status': 'error'
+        }), 403
+    
+    iniciada = recargar_en_segundo_plano()
+    logger.info("🔄 Recarga de catálogos solicitada" if iniciada else "⏳ Ya hay una recarga en curso")
+    
+    return jsonify({
+        'status': 'recarga_iniciada' if iniciada else 'recarga_en_curso',
+        'version_actual': catalogo['version']
+    }), 202
+
 @app.route('/', methods=['GET'])
 def inicio():
     """Endpoint de inicio para verificar que el servidor está funcionando"""
+    actual = catalogo
     return jsonify({
         'mensaje': '🚀 Servidor Flask de consultas TIA funcionando correctamente',
         'version': '2.0',
         'endpoints_disponibles': {
             '/consultar': 'POST - Consultar productos',
+            '/consultar/batch': 'POST - Consultar varios mensajes',
             '/health': 'GET - Health check',
-            '/productos/stats': 'GET - Estadísticas de productos'
+            '/productos/stats': 'GET - Estadísticas de productos',
+            '/metrics': 'GET - Métricas en formato Prometheus',
+            '/admin/recargar': 'POST - Recargar catálogos (requiere X-Admin-Token)'
         },
         'archivos_cargados': {
-            'productos_combined': len(productos_combined),
-            'productos_meli': len(productos_meli),
-            'productos_page': len(productos_page),
-            'total': len(productos_combined) + len(productos_meli) + len(productos_page)
+            'productos_combined': actual['conteos']['combined'],
+            'productos_meli': actual['conteos']['meli'],
+            'productos_page': actual['conteos']['page'],
+            'total': actual['conteos']['combined'] + actual['conteos']['meli'] + actual['conteos']['page']
         }
     })
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check para monitoreo"""
-    total_productos = len(productos_combined) + len(productos_meli) + len(productos_page)
+    actual = catalogo
+    total_productos = actual['conteos']['combined'] + actual['conteos']['meli'] + actual['conteos']['page']
     
     status = 'ok' if total_productos > 0 else 'warning'
     
     return jsonify({
         'status': status,
         'archivos_json': {
-            'productos_combined': len(productos_combined),
-            'productos_meli': len(productos_meli),
-            'productos_page': len(productos_page),
+            'productos_combined': actual['conteos']['combined'],
+            'productos_meli': actual['conteos']['meli'],
+            'productos_page': actual['conteos']['page'],
             'total': total_productos
         },
+        'productos_unicos': len(actual['productos']),
+        'catalogo_version': actual['version'],
         'mensaje': 'Servidor funcionando correctamente' if status == 'ok' else 'No hay productos cargados'
     })
 
 @app.route('/productos/stats', methods=['GET'])
 def productos_stats():
     """Endpoint para ver estadísticas de productos cargados"""
+    actual = catalogo
     return jsonify({
-        'total_productos': len(productos_combined) + len(productos_meli) + len(productos_page),
+        'total_productos': actual['conteos']['combined'] + actual['conteos']['meli'] + actual['conteos']['page'],
         'por_fuente': {
-            'combined': len(productos_combined),
-            'mercadolibre': len(productos_meli),
-            'pagina_web': len(productos_page)
+            'combined': actual['conteos']['combined'],
+            'mercadolibre': actual['conteos']['meli'],
+            'pagina_web': actual['conteos']['page']
         },
+        'productos_unicos': len(actual['productos']),
         'muestra_productos': [
             p.get('nombre', 'Sin nombre') 
-            for p in (productos_combined + productos_page)[:10]
-        ]
+            for p in actual['productos'][:10]
+        ],
+        'cache': cache_respuestas.estadisticas(),
+        'latencias_segundos': metricas.cuantiles('tia_etapa_segundos'),
+        'catalogo': {
+            'version': actual['version'],
+            'cargado_en': actual['cargado_en']
+        }
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Latencias por etapa, productos puntuados, cache y tamaño del catálogo (formato Prometheus)"""
+    if not metricas.activo:
+        return jsonify({
+            'error': 'Métricas desactivadas (METRICAS=0)',
+            'status': 'error'
+        }), 404
+    
+    actual = catalogo
+    cache = cache_respuestas.estadisticas()
+    indicadores = [
+        ('tia_catalogo_version', 'gauge', 'Versión del catálogo activo', [((), actual['version'])]),
+        ('tia_catalogo_productos', 'gauge', 'Productos en los JSON por fuente',
+         [((('fuente', fuente),), total) for fuente, total in actual['conteos'].items()]),
+        ('tia_catalogo_productos_unicos', 'gauge', 'Productos únicos tras fusionar los catálogos', [((), len(actual['productos']))]),
+        ('tia_indice_registros', 'gauge', 'Registros del índice de búsqueda', [((), len(actual['indice']['registros']))]),
+        ('tia_indice_terminos', 'gauge', 'Términos del índice invertido', [((), len(actual['indice']['invertido']['vocabulario']))]),
+        ('tia_cache_entradas', 'gauge', 'Respuestas guardadas en la cache', [((), cache['entradas'])]),
+        ('tia_cache_consultas_total', 'counter', 'Consultas a la cache de respuestas por resultado',
+         [((('resultado', 'hit'),), cache['hits']), ((('resultado', 'miss'),), cache['misses'])]),
+        ('tia_cache_hit_rate', 'gauge', 'Proporción de consultas respondidas desde la cache', [((), cache['hit_rate'])])
+    ]
+    return Response(metricas.exportar(indicadores), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Cargar archivos JSON al iniciar la aplicación
 cargar_archivos_json()
+vigilante_catalogos.iniciar()
 
 if __name__ == '__main__':
     logger.info("="*60)
@@ -369,12 +691,12 @@ if __name__ == '__main__':
     logger.info("="*60)
     
     # Mostrar resumen de productos cargados
-    total = len(productos_combined) + len(productos_meli) + len(productos_page)
+    total = catalogo['conteos']['combined'] + catalogo['conteos']['meli'] + catalogo['conteos']['page']
     logger.info(f"📦 Total productos cargados: {total}")
-    logger.info(f"   - Combined: {len(productos_combined)}")
-    logger.info(f"   - MercadoLibre: {len(productos_meli)}")
-    logger.info(f"   - Página Web: {len(productos_page)}")
+    logger.info(f"   - Combined: {catalogo['conteos']['combined']}")
+    logger.info(f"   - MercadoLibre: {catalogo['conteos']['meli']}")
+    logger.info(f"   - Página Web: {catalogo['conteos']['page']}")
     logger.info("="*60)
     
-    # Ejecutar servidor
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Ejecutar servidor de desarrollo (para producción ver gunicorn.conf.py / asgi.py)
+    app.run(debug=os.environ.get('FLASK_DEBUG', '0') == '1', host='0.0.0.0', port=5000)
@@ -0,0 +1,19 @@
+"""
+Punto de entrada ASGI del servidor TIA
+
+Uso (varios workers compartiendo el catálogo cargado en el proceso maestro):
+    gunicorn -c gunicorn.conf.py -k uvicorn_worker.UvicornWorker asgi:asgi_app
+
+Uso (un solo proceso):
+    uvicorn asgi:asgi_app --host 0.0.0.0 --port 5000
+"""
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app
+
+# Las vistas de Flask son síncronas: el adaptador las ejecuta en un pool de THREADS
+# hilos (como gthread), así hasta THREADS consultas por worker corren a la vez y una
+# consulta lenta no bloquea al resto. (asgiref.WsgiToAsgi usa un solo hilo por worker.)
+asgi_app = WSGIMiddleware(app, workers=int(os.environ.get('THREADS', 8)))
@@ -0,0 +1,250 @@
+"""
+Benchmark sin servidor de la búsqueda y el armado de contexto
+
+    python benchmark.py                                  (escalas 1, 10 y 100)
+    python benchmark.py --escalas 1,10 --repeticiones 5 --salida resultados.json
+
+Construye el catálogo en el mismo proceso, con combined.json replicado N veces
+(escala N), y mide buscar_productos_relevantes, generar_contexto_optimizado y la
+vista /consultar (cliente de pruebas de Flask, sin red). El resultado es un JSON
+con throughput, percentiles de latencia y memoria pico, para comparar versiones.
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# Sin snapshot ni detalle por petición en el log: se mide la búsqueda, no la escritura de logs
+os.environ['CATALOGO_SNAPSHOT'] = ''
+os.environ.setdefault('LOG_MUESTREO', '0')
+
+import app  # noqa: E402
+import bitacora  # noqa: E402
+from fusion import es_valor_faltante, separar_urls  # noqa: E402
+from motores import MOTORES  # noqa: E402
+
+# LOG_MUESTREO solo aplica a las peticiones (/consultar sortea el detalle); las llamadas
+# directas a buscar_productos_relevantes usan el contexto del hilo principal
+bitacora.detalle_activo.set(False)
+
+# Consultas de clientes reales: productos, errores de dedo, dosis, preguntas generales
+CONSULTAS = [
+    "busco mejoradores para tortillas de maiz",
+    "precio tortillas",
+    "conservador pan",
+    "acelerante",
+    "antiadherente para comal",
+    "base para pan de hamburguesa",
+    "tortiyas de harina",
+    "cuánta base por kilo de harina",
+    "mejorador 3m plus",
+    "pan dulce",
+    "conservadores para tortillas",
+    "base nata dulce",
+    "mejorador de masa para pan blanco",
+    "harina de maiz nixtamalizada",
+    "que blanqueador me recomiendan para tortilla de maiz",
+    "necesito algo para que las tortillas duren mas",
+    "teflon liquido grado alimenticio",
+    "sustituto de grasa para tortillas de trigo",
+    "dosis de conservador 30-m",
+    "base para tortillas de nopal",
+    "cuanto cuesta el bulto de 20 kg de mejorador",
+    "tienen base chipotle",
+    "masa azul",
+    "productos para gorditas",
+    "¿horarios?",
+    "¿cómo los contacto?",
+    "hola buenas tardes",
+]
+
+ESCALAS_POR_DEFECTO = (1, 10, 100)
+PERCENTILES = (50, 95, 99)
+
+
+def escalar_productos(productos, escala):
+    """Replicar los productos 'escala' veces; cada copia es un producto distinto al fusionar"""
+    escalados = list(productos)
+    for serie in range(1, escala):
+        for producto in productos:
+            copia = copy.copy(producto)
+            for campo in ('nombre', 'prod_mercado'):
+                if not es_valor_faltante(copia.get(campo)):
+                    copia[campo] = f"{copia[campo]} serie {serie}"
+            # URLs propias para que MercadoLibre no resuelva sus publicaciones a las copias
+            for campo in ('url', 'url_meli'):
+                urls = separar_urls(copia.get(campo))
+                if urls:
+                    copia[campo] = ';'.join(f"{url}?serie={serie}" for url in urls)
+            escalados.append(copia)
+    return escalados
+
+
+def percentil(muestras_ordenadas, p):
+    """Percentil por el método del rango más cercano"""
+    if not muestras_ordenadas:
+        return None
+    posicion = max(0, min(len(muestras_ordenadas) - 1, round(p / 100 * len(muestras_ordenadas)) - 1))
+    return muestras_ordenadas[posicion]
+
+
+def resumir(muestras):
+    """Throughput y percentiles (ms) de una lista de duraciones en segundos"""
+    ordenadas = sorted(muestras)
+    total = sum(ordenadas)
+    resumen = {
+        'operaciones': len(ordenadas),
+        'segundos': round(total, 6),
+        'por_segundo': round(len(ordenadas) / total, 1) if total else None,
+        'media_ms': round(total / len(ordenadas) * 1000, 4) if ordenadas else None,
+        'max_ms': round(ordenadas[-1] * 1000, 4) if ordenadas else None
+    }
+    for p in PERCENTILES:
+        valor = percentil(ordenadas, p)
+        resumen[f'p{p}_ms'] = round(valor * 1000, 4) if valor is not None else None
+    return resumen
+
+
+def medir(funcion, argumentos, repeticiones):
+    """Duración de cada llamada (una vuelta de calentamiento sin medir)"""
+    for args in argumentos:
+        funcion(*args)
+    muestras = []
+    reloj = time.perf_counter
+    for _ in range(repeticiones):
+        for args in argumentos:
+            inicio = reloj()
+            funcion(*args)
+            muestras.append(reloj() - inicio)
+    return muestras
+
+
+def construir(productos, respuestas, empresa):
+    """Construir el catálogo escalado: (catálogo, segundos, MB pico de la construcción)"""
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    nuevo = app.indexar_catalogo(productos, respuestas, empresa)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return nuevo, segundos, pico / 2 ** 20
+
+
+def activar(nuevo):
+    """Reemplazar el catálogo del servidor (lo usa la vista /consultar)"""
+    nuevo['version'] = app.catalogo['version'] + 1
+    app.catalogo = nuevo
+    app.cache_respuestas.invalidar()
+
+
+def medir_escala(escala, base, respuestas, empresa, motores, repeticiones):
+    productos = dict(base, combined=escalar_productos(base['combined'], escala))
+    nuevo, segundos_construccion, pico_mb = construir(productos, respuestas, empresa)
+    activar(nuevo)
+
+    resultado = {
+        'productos_combined': len(productos['combined']),
+        'productos_unicos': len(nuevo['productos']),
+        'terminos_indice': len(nuevo['indice']['invertido']['vocabulario']),
+        'construccion_segundos': round(segundos_construccion, 4),
+        'construccion_memoria_pico_mb': round(pico_mb, 2),
+        'motores': {}
+    }
+
+    cliente = app.app.test_client()
+    for motor in motores:
+        busquedas = [(consulta, app.LIMITE_POR_DEFECTO, motor, nuevo) for consulta in CONSULTAS]
+        encontrados = [app.buscar_productos_relevantes(*args) for args in busquedas]
+
+        # /consultar sin cache (cada consulta recorre todo el camino) y con la cache caliente
+        max_entradas = app.cache_respuestas.max_entradas
+        app.cache_respuestas.max_entradas = 0
+        peticiones = [({'message': consulta, 'motor': motor},) for consulta in CONSULTAS]
+        sin_cache = medir(lambda cuerpo: cliente.post('/consultar', json=cuerpo), peticiones, repeticiones)
+        app.cache_respuestas.max_entradas = max_entradas
+        con_cache = medir(lambda cuerpo: cliente.post('/consultar', json=cuerpo), peticiones, repeticiones)
+
+        resultado['motores'][motor] = {
+            'buscar_productos_relevantes': resumir(medir(app.buscar_productos_relevantes, busquedas, repeticiones)),
+            'generar_contexto_optimizado': resumir(medir(
+                app.generar_contexto_optimizado, [(productos_consulta,) for productos_consulta in encontrados], repeticiones
+            )),
+            'consultar': resumir(sin_cache),
+            'consultar_con_cache': resumir(con_cache)
+        }
+    return resultado
+
+
+def version_codigo():
+    """Commit de git del árbol medido (None fuera de un repositorio)"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sin servidor de la búsqueda de productos')
+    parser.add_argument('--escalas', default=','.join(map(str, ESCALAS_POR_DEFECTO)),
+                        help='Veces que se replica combined.json, separadas por coma (por defecto 1,10,100)')
+    parser.add_argument('--motores', default=','.join(MOTORES),
+                        help=f'Motores a medir (por defecto {",".join(MOTORES)})')
+    parser.add_argument('--repeticiones', type=int, default=10, help='Vueltas sobre todas las consultas (por defecto 10)')
+    parser.add_argument('--salida', default='benchmark_resultados.json', help='Archivo JSON de resultados')
+    opciones = parser.parse_args()
+
+    escalas = [int(escala) for escala in opciones.escalas.split(',')]
+    motores = [motor for motor in opciones.motores.split(',') if motor]
+    desconocidos = [motor for motor in motores if motor not in MOTORES]
+    if desconocidos:
+        sys.exit(f'Motores desconocidos: {", ".join(desconocidos)}. Opciones: {", ".join(MOTORES)}')
+
+    base = {fuente: app.leer_archivo_json(ruta) for fuente, ruta in app.ARCHIVOS_CATALOGO.items()}
+    respuestas = app.leer_json(app.ARCHIVOS_INFORMACION['respuestas'])
+    empresa = app.leer_json(app.ARCHIVOS_INFORMACION['empresa'])
+
+    resultados = {
+        'entorno': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'numpy': 'tfidf' in MOTORES,
+            'commit': version_codigo()
+        },
+        'configuracion': {
+            'consultas': len(CONSULTAS),
+            'repeticiones': opciones.repeticiones,
+            'limite': app.LIMITE_POR_DEFECTO
+        },
+        'escalas': {}
+    }
+
+    for escala in escalas:
+        print(f"⏱️  Escala {escala}x ...", flush=True)
+        resultados['escalas'][str(escala)] = medir_escala(escala, base, respuestas, empresa, motores, opciones.repeticiones)
+        for motor, medidas in resultados['escalas'][str(escala)]['motores'].items():
+            busqueda = medidas['buscar_productos_relevantes']
+            print(f"   {motor}: búsqueda p50 {busqueda['p50_ms']} ms, p99 {busqueda['p99_ms']} ms, "
+                  f"/consultar {medidas['consultar']['por_segundo']} consultas/s")
+
+    # Pico de memoria residente de todo el proceso (Linux: KB, macOS: bytes)
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    resultados['memoria_residente_pico_mb'] = round(maxrss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+    with open(opciones.salida, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2, sort_keys=True)
+    print(f"✅ Resultados en {opciones.salida}")
+
+
+if __name__ == '__main__':
+    main()
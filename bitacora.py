@@ -0,0 +1,143 @@
+# Logging del servidor: escritura en un hilo aparte (cola), formato texto o JSON lines y muestreo por petición
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# 'texto' (legible) o 'json' (una línea JSON por registro, para agregadores de logs)
+LOG_FORMATO = os.environ.get('LOG_FORMATO', 'texto')
+LOG_NIVEL = os.environ.get('LOG_NIVEL', 'INFO').upper()
+
+# Proporción de peticiones (0 a 1) cuyo detalle se registra; advertencias y errores siempre
+LOG_MUESTREO = float(os.environ.get('LOG_MUESTREO', 1.0))
+
+# Largo máximo de los payloads y mensajes que se copian al log
+LOG_MAX_CARACTERES = int(os.environ.get('LOG_MAX_CARACTERES', 300))
+
+FORMATO_TEXTO = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Atributos propios de LogRecord (el resto son campos agregados con extra=)
+ATRIBUTOS_REGISTRO = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'detalle', 'taskName'}
+
+# Si el detalle de la petición en curso se registra (se sortea al empezar cada petición)
+detalle_activo = ContextVar('detalle_activo', default=True)
+
+_manejador_cola = None
+_escritor = None
+_escritor_activo = False
+
+
+class FormatoJSON(logging.Formatter):
+    """Un objeto JSON por línea: fecha, nivel, logger, mensaje y los campos de extra="""
+
+    def format(self, record):
+        datos = {
+            'fecha': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage()
+        }
+        datos.update({
+            clave: valor for clave, valor in vars(record).items()
+            if clave not in ATRIBUTOS_REGISTRO
+        })
+        if record.exc_text:
+            datos['excepcion'] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class ManejadorCola(QueueHandler):
+    """QueueHandler que en el hilo de la petición solo resuelve el mensaje (el formato lo aplica el escritor)"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            # El traceback no se puede enviar a otro hilo: se pasa a texto
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class FiltroMuestreo(logging.Filter):
+    """Descartar los registros de detalle de las peticiones que no salieron sorteadas"""
+
+    def filter(self, record):
+        return not getattr(record, 'detalle', False) or detalle_activo.get()
+
+
+def sortear_detalle():
+    """Decidir al empezar una petición si se registra su detalle; devuelve la decisión"""
+    activo = LOG_MUESTREO >= 1 or random.random() < LOG_MUESTREO
+    detalle_activo.set(activo)
+    return activo
+
+
+def truncar(valor, largo=None):
+    """Texto de un valor (los dicts y listas como JSON) recortado para el log"""
+    largo = LOG_MAX_CARACTERES if largo is None else largo
+    texto = valor if isinstance(valor, str) else json.dumps(valor, ensure_ascii=False, default=str)
+    if len(texto) <= largo:
+        return texto
+    return f"{texto[:largo]}... (+{len(texto) - largo} caracteres)"
+
+
+def detalle(logger, mensaje, **campos):
+    """Registrar una línea de detalle de la petición (INFO, sujeta al muestreo)
+
+    Los campos van como atributos del registro: en formato JSON se escriben
+    como claves propias.
+    """
+    if detalle_activo.get() and logger.isEnabledFor(logging.INFO):
+        logger.info(mensaje, extra=dict(campos, detalle=True))
+
+
+def iniciar_escritor():
+    """(Re)crear la cola y el hilo que escribe los registros (los hilos no sobreviven al fork)"""
+    global _escritor, _escritor_activo
+    if _manejador_cola is None:
+        return
+    salida = logging.StreamHandler(sys.stderr)
+    salida.setFormatter(FormatoJSON() if LOG_FORMATO == 'json' else logging.Formatter(FORMATO_TEXTO))
+    cola = queue.SimpleQueue()
+    _manejador_cola.queue = cola
+    _escritor = QueueListener(cola, salida)
+    _escritor.start()
+    _escritor_activo = True
+
+
+def detener_escritor():
+    """Escribir lo pendiente en la cola y detener el hilo escritor"""
+    global _escritor_activo
+    if _escritor_activo:
+        _escritor.stop()
+        _escritor_activo = False
+
+
+def configurar_logging():
+    """Enviar los registros del proceso a una cola que vacía un hilo aparte
+
+    Las peticiones solo encolan el registro; el formato y la escritura a la
+    salida ocurren en el hilo escritor. No hace nada si el logging ya está
+    configurado (por ejemplo al importar app desde snapshot.py).
+    """
+    global _manejador_cola
+    raiz = logging.getLogger()
+    if raiz.handlers:
+        return
+
+    _manejador_cola = ManejadorCola(queue.SimpleQueue())
+    _manejador_cola.addFilter(FiltroMuestreo())
+    raiz.addHandler(_manejador_cola)
+    raiz.setLevel(LOG_NIVEL)
+    iniciar_escritor()
+    atexit.register(detener_escritor)
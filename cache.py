@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheRespuestas:
+    """Cache LRU con expiración (TTL) para las respuestas de /consultar"""
+
+    def __init__(self, max_entradas=1024, ttl_segundos=300):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expiradas = 0
+        self.desalojadas = 0
+        self.invalidaciones = 0
+
+    def obtener(self, clave):
+        """Obtener una respuesta guardada, o None si no existe o expiró"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+
+            expira, valor = entrada
+            if expira <= time.monotonic():
+                del self._entradas[clave]
+                self.expiradas += 1
+                self.misses += 1
+                return None
+
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        """Guardar una respuesta, desalojando la menos usada si se llena"""
+        if self.max_entradas <= 0:
+            return
+        with self._lock:
+            self._entradas[clave] = (time.monotonic() + self.ttl_segundos, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.desalojadas += 1
+
+    def invalidar(self):
+        """Vaciar la cache (por ejemplo al recargar los catálogos)"""
+        with self._lock:
+            self._entradas.clear()
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        """Contadores de uso de la cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'ttl_segundos': self.ttl_segundos,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'expiradas': self.expiradas,
+                'desalojadas': self.desalojadas,
+                'invalidaciones': self.invalidaciones
+            }
@@ -0,0 +1,162 @@
+import math
+
+from fusion import es_valor_faltante
+
+# Largo máximo de cada campo de texto dentro del contexto
+LARGO_DESCRIPCION = 200
+LARGO_CAMPO = 150
+
+# Estimación de caracteres por token del LLM (para presupuestos en tokens)
+CARACTERES_POR_TOKEN = 4
+
+TITULO_PRODUCTOS = "=== PRODUCTOS RELEVANTES ===\n"
+
+
+def recortar(texto, largo):
+    """Recortar un texto a 'largo' caracteres, con '...' solo si se cortó"""
+    texto = texto.strip()
+    return texto if len(texto) <= largo else texto[:largo] + '...'
+
+
+def texto_campo(producto, campo):
+    """Valor de texto de un campo, vacío si falta o es un texto de relleno"""
+    valor = producto.get(campo, '')
+    if not isinstance(valor, str) or es_valor_faltante(valor):
+        return ''
+    return valor
+
+
+def estimar_tokens(texto):
+    """Estimar los tokens de un texto a partir de su largo"""
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def renderizar_producto(producto):
+    """Partes del bloque de contexto de un producto (sin el número de posición)
+
+    La primera parte es la cabecera (nombre y precios); el resto son las líneas
+    de cada campo en orden de importancia.
+    """
+    lineas = [f"PRODUCTO: {producto.get('nombre', 'Sin nombre')}"]
+
+    # Precios por variante (si hay varias presentaciones a la venta)
+    variantes = [v for v in producto.get('variantes', []) if v.get('precio')]
+    if len(variantes) > 1:
+        precios = " | ".join(f"{v['nombre']}: ${v['precio']:,.2f} MXN" for v in variantes)
+        lineas.append(f"   💰 Precios: {precios}")
+
+    # Precio (si existe)
+    elif producto.get('precio'):
+        precio = producto['precio']
+        # Manejar diferentes formatos de precio
+        if isinstance(precio, (int, float)):
+            lineas.append(f"   💰 Precio: ${precio:,.2f} MXN")
+        else:
+            lineas.append(f"   💰 Precio: {precio}")
+
+    # Descripción corta
+    descripcion = texto_campo(producto, 'descripcion')
+    if descripcion:
+        lineas.append(f"   📝 {recortar(descripcion, LARGO_DESCRIPCION)}")
+
+    # Beneficios (si existen)
+    beneficios = texto_campo(producto, 'beneficios')
+    if beneficios:
+        lineas.append(f"   ✨ Beneficios: {recortar(beneficios, LARGO_CAMPO)}")
+
+    # Detalles (si existen)
+    detalles = texto_campo(producto, 'detalle_prod')
+    if detalles:
+        lineas.append(f"   🔍 Detalles: {recortar(detalles, LARGO_CAMPO)}")
+
+    # Presentación (si existe)
+    presentacion = texto_campo(producto, 'presentacion')
+    if presentacion:
+        lineas.append(f"   📦 Presentación: {presentacion}")
+
+    # Nombre y precio van siempre juntos
+    cabecera = 2 if len(lineas) > 1 and lineas[1].startswith("   💰") else 1
+    return ("\n".join(lineas[:cabecera]),) + tuple(lineas[cabecera:])
+
+
+def renderizar_fragmentos(productos):
+    """Precalcular el bloque de contexto de cada producto (en el orden de 'productos')"""
+    return tuple(renderizar_producto(producto) for producto in productos)
+
+
+def partes_item(item):
+    """Partes del bloque de un producto encontrado, con sus filas de dosis (si las hay) tras la cabecera"""
+    partes = tuple(item['producto'].get('fragmento', ()))
+    if item.get('dosis'):
+        partes = partes[:1] + (f"   ⚖️ Dosis: {'; '.join(item['dosis'])}",) + partes[1:]
+    return partes
+
+
+def empaquetar(productos, presupuesto):
+    """Elegir las partes de cada producto que entran en 'presupuesto' caracteres
+
+    Primero entran las cabeceras de los productos de mayor score y luego sus
+    campos, en orden, mientras quepan. Devuelve [(item, [partes])].
+    """
+    usado = len(TITULO_PRODUCTOS)
+    candidatos = []
+    for item in productos:
+        partes = partes_item(item)
+        # Cada línea suma su largo + salto de línea, más la línea en blanco del bloque
+        costo = len(f"{len(candidatos) + 1}. {partes[0]}") + 2
+        if usado + costo <= presupuesto:
+            usado += costo
+            candidatos.append((item, partes))
+
+    seleccion = []
+    for item, partes in candidatos:
+        elegidas = [partes[0]]
+        for linea in partes[1:]:
+            if usado + len(linea) + 1 <= presupuesto:
+                usado += len(linea) + 1
+                elegidas.append(linea)
+        seleccion.append((item, elegidas))
+    return seleccion
+
+
+def seleccionar_partes(productos, presupuesto=None):
+    """Partes de cada producto que van al contexto: [(item, [partes])]
+
+    Sin presupuesto se incluyen todas las partes de cada producto; con un
+    presupuesto en caracteres, solo las que entren (puede quedar vacío si no
+    entra ni una cabecera).
+    """
+    if presupuesto is None:
+        return [(item, partes_item(item)) for item in productos]
+    return empaquetar(productos, presupuesto)
+
+
+def unir_fragmentos(seleccion):
+    """Armar el contexto de la respuesta uniendo los bloques ya renderizados"""
+    if not seleccion:
+        return ""
+
+    contexto_partes = [TITULO_PRODUCTOS]
+    for idx, (item, partes) in enumerate(seleccion, 1):
+        contexto_partes.append(f"{idx}. {partes[0]}")
+        contexto_partes.extend(partes[1:])
+        contexto_partes.append("")  # Línea en blanco entre productos
+    return "\n".join(contexto_partes)
+
+
+def recortar_lineas(texto, presupuesto):
+    """Quedarse con las primeras líneas completas de un texto que entren en el presupuesto"""
+    lineas = []
+    usado = -1  # La primera línea no lleva salto de línea antes
+    for linea in texto.split("\n"):
+        if usado + len(linea) + 1 > presupuesto:
+            break
+        usado += len(linea) + 1
+        lineas.append(linea)
+    return "\n".join(lineas)
+
+
+def recortar_respuesta(texto, presupuesto):
+    """Recortar un texto con título (respuestas, información general); vacío si solo entra el título"""
+    recortado = recortar_lineas(texto, presupuesto)
+    return recortado if sum(1 for linea in recortado.split("\n") if linea.strip()) > 1 else ""
@@ -0,0 +1,147 @@
+import ast
+import re
+from array import array
+
+from normalizacion import normalizar
+
+# Palabras que indican una pregunta de dosis o cantidades ("cuánta base por kilo de harina")
+PALABRAS_DOSIS = frozenset([
+    'cuanto', 'cuanta', 'cuantos', 'cuantas', 'dosis', 'dosificacion', 'cantidad',
+    'cantidades', 'porcion', 'porciones', 'proporcion', 'receta', 'formula',
+    'formulacion', 'kilo', 'kilos', 'gramos', 'litro', 'litros'
+])
+
+# Palabras de precio: "cuánto cuesta", "precio de 5 kilos" no son preguntas de dosis
+PALABRAS_PRECIO = frozenset([
+    'precio', 'precios', 'cuesta', 'cuestan', 'costo', 'costos', 'vale', 'valen',
+    'cotizacion', 'cotizar', 'pesos', 'mxn', 'comprar', 'venden'
+])
+
+# Ingredientes básicos de cualquier receta: solo cuentan junto con una palabra más específica
+INGREDIENTES_BASICOS = frozenset(['harina', 'agua', 'sal', 'azucar', 'levadura', 'manteca', 'aceite', 'huevo', 'leche'])
+
+# Palabras de ingrediente que aparecen en al menos esta proporción de las tablas también son comunes
+PROPORCION_COMUN = 0.5
+
+# Palabras que no identifican un ingrediente
+PALABRAS_VACIAS = frozenset(['para', 'por', 'con', 'del', 'las', 'los', 'una', 'uno', 'que', 'debo', 'uso', 'usar', 'lleva'])
+
+# Máximo de filas de dosis que se agregan al contexto de cada producto
+MAX_FILAS_DOSIS = 3
+
+
+def palabras(texto):
+    """Palabras normalizadas de un texto (sin signos de puntuación)"""
+    return re.findall(r'\w+', normalizar(texto))
+
+
+def leer_dosis_tabla(valor):
+    """Filas de dosis_tabla como dicts (prod_page.json trae la lista, combined.json su repr en texto)"""
+    if isinstance(valor, str) and valor.strip().startswith('['):
+        try:
+            valor = ast.literal_eval(valor.strip())
+        except (ValueError, SyntaxError):
+            return []
+    if not isinstance(valor, list):
+        return []
+    return [fila for fila in valor if isinstance(fila, dict)]
+
+
+def formatear_fila(fila):
+    """Texto de una fila de dosis, ej. 'Harina fuerte: 1 kg | 5 kg | 10 kg'"""
+    # Las tablas usan 'Ingrediente'/'ingrediente', 'Cantidad'/'cantidad' o 'porcion_1'..'porcion_n'
+    campos = {clave.lower(): str(valor).strip() for clave, valor in fila.items() if valor is not None}
+    ingrediente = campos.get('ingrediente', '')
+    porciones = [campos[clave] for clave in sorted(campos) if clave.startswith('porcion') and campos[clave]]
+    cantidades = porciones or [campos[clave] for clave in ('cantidad',) if campos.get(clave)]
+    if not ingrediente or not cantidades:
+        return ''
+
+    texto = f"{ingrediente}: {' | '.join(cantidades)}"
+    if campos.get('tipo'):
+        texto += f" ({campos['tipo']})"
+    return texto
+
+
+def construir_indice_dosis(productos):
+    """Construir el índice palabra de ingrediente -> filas de dosis de todos los productos"""
+    postings = {}
+    productos_filas = array('i')  # id de fila -> id de producto
+    filas = []
+    tablas_por_palabra = {}
+    tablas = 0
+
+    for id_producto, producto in enumerate(productos):
+        palabras_tabla = set()
+        for fila in leer_dosis_tabla(producto.get('dosis_tabla')):
+            texto = formatear_fila(fila)
+            if not texto:
+                continue
+            id_fila = len(filas)
+            filas.append(texto)
+            productos_filas.append(id_producto)
+
+            # Solo el ingrediente: 'tipo' describe la receta ("100% Harina de maíz"), no la fila
+            ingrediente = next((str(valor) for clave, valor in fila.items() if clave.lower() == 'ingrediente'), '')
+            for palabra in set(palabras(ingrediente)):
+                if len(palabra) >= 3 and palabra not in PALABRAS_VACIAS:
+                    postings.setdefault(palabra, array('i')).append(id_fila)
+                    palabras_tabla.add(palabra)
+
+        if palabras_tabla:
+            tablas += 1
+            for palabra in palabras_tabla:
+                tablas_por_palabra[palabra] = tablas_por_palabra.get(palabra, 0) + 1
+
+    comunes = INGREDIENTES_BASICOS | {
+        palabra for palabra, conteo in tablas_por_palabra.items() if conteo >= PROPORCION_COMUN * tablas
+    }
+    return {
+        'postings': postings,
+        'productos': productos_filas,
+        'filas': tuple(filas),
+        'comunes': frozenset(comunes)
+    }
+
+
+def buscar_dosis(indice, mensaje_lower):
+    """Buscar las filas de dosis de los ingredientes mencionados en una pregunta de cantidades
+
+    Devuelve [(id_producto, palabras encontradas, [filas])], de más a menos
+    palabras específicas encontradas; vacío si el mensaje no pregunta por dosis
+    (o pregunta por precios). Un producto encontrado solo por ingredientes
+    comunes (harina, agua, sal...) no cuenta.
+    """
+    palabras_mensaje = palabras(mensaje_lower)
+    if PALABRAS_DOSIS.isdisjoint(palabras_mensaje) or not PALABRAS_PRECIO.isdisjoint(palabras_mensaje):
+        return []
+
+    buscadas = {
+        palabra for palabra in palabras_mensaje
+        if len(palabra) >= 3 and palabra not in PALABRAS_DOSIS and palabra not in PALABRAS_VACIAS
+    }
+
+    comunes = indice['comunes']
+
+    # Palabras encontradas por fila (específicas, todas) y palabras específicas por producto
+    por_fila = {}
+    por_producto = {}
+    for palabra in buscadas:
+        especifica = palabra not in comunes
+        for id_fila in indice['postings'].get(palabra, ()):
+            especificas, total = por_fila.get(id_fila, (0, 0))
+            por_fila[id_fila] = (especificas + especifica, total + 1)
+            if especifica:
+                por_producto.setdefault(indice['productos'][id_fila], set()).add(palabra)
+
+    # Las filas de ingredientes comunes acompañan a las de un producto ya encontrado
+    filas_por_producto = {}
+    for id_fila in sorted(por_fila, key=lambda id_fila: (-por_fila[id_fila][0], -por_fila[id_fila][1], id_fila)):
+        id_producto = indice['productos'][id_fila]
+        if id_producto in por_producto:
+            filas_por_producto.setdefault(id_producto, []).append(indice['filas'][id_fila])
+
+    return [
+        (id_producto, len(por_producto[id_producto]), filas_por_producto[id_producto][:MAX_FILAS_DOSIS])
+        for id_producto in sorted(por_producto, key=lambda id_producto: (-len(por_producto[id_producto]), id_producto))
+    ]
@@ -0,0 +1,165 @@
+"""
+Evaluación de relevancia de los motores de búsqueda con consultas etiquetadas
+
+    python evaluar_relevancia.py                                 (todos los motores)
+    python evaluar_relevancia.py --salida despues.json --comparar antes.json
+
+Cada consulta de relevancia.json trae los nombres de los productos que deberían
+aparecer. Para cada motor se calcula recall@k y MRR de buscar_productos_relevantes
+junto con su latencia. Con --comparar, termina con error si algún motor pierde
+recall@5 o MRR frente a un resultado anterior (más que --tolerancia).
+"""
+import argparse
+import json
+import os
+import sys
+
+# Solo advertencias en el log: la salida es la tabla de métricas
+os.environ.setdefault('LOG_NIVEL', 'WARNING')
+
+import benchmark  # noqa: E402  Configura el entorno (sin snapshot ni log por petición) antes de importar app
+from benchmark import medir, resumir, version_codigo  # noqa: E402
+from motores import MOTORES  # noqa: E402
+from normalizacion import normalizar  # noqa: E402
+
+app = benchmark.app
+
+ARCHIVO_CONSULTAS = 'relevancia.json'
+VALORES_K = (1, 3, 5)
+LIMITE_EVALUACION = max(VALORES_K)
+
+# Métricas que no pueden bajar al comparar con un resultado anterior
+METRICAS_COMPARADAS = ('recall@5', 'mrr')
+
+
+def leer_consultas(ruta, productos):
+    """Consultas etiquetadas; falla si alguna etiqueta no es un producto del catálogo"""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        consultas = json.load(f)
+
+    nombres = {normalizar(producto.get('nombre', '')) for producto in productos}
+    desconocidos = sorted({
+        esperado for consulta in consultas for esperado in consulta['esperados']
+        if normalizar(esperado) not in nombres
+    })
+    if desconocidos:
+        sys.exit(f"Productos etiquetados que no están en el catálogo: {'; '.join(desconocidos)}")
+    return consultas
+
+
+def recall(encontrados, esperados, k):
+    """Esperados entre los k primeros, sobre los que caben en k (1.0 = top-k perfecto)"""
+    return len(set(encontrados[:k]) & esperados) / min(len(esperados), k)
+
+
+def rango_reciproco(encontrados, esperados):
+    """1 / posición del primer producto esperado (0 si no aparece)"""
+    for posicion, nombre in enumerate(encontrados, 1):
+        if nombre in esperados:
+            return 1 / posicion
+    return 0.0
+
+
+def evaluar_motor(motor, consultas, repeticiones):
+    """recall@k, MRR y latencia de un motor; también las consultas con recall@5 incompleto"""
+    sumas = {f'recall@{k}': 0.0 for k in VALORES_K}
+    sumas['mrr'] = 0.0
+    fallas = []
+
+    for consulta in consultas:
+        resultados = app.buscar_productos_relevantes(consulta['mensaje'], LIMITE_EVALUACION, motor)
+        encontrados = [normalizar(item['producto'].get('nombre', '')) for item in resultados]
+        esperados = {normalizar(nombre) for nombre in consulta['esperados']}
+
+        for k in VALORES_K:
+            sumas[f'recall@{k}'] += recall(encontrados, esperados, k)
+        sumas['mrr'] += rango_reciproco(encontrados, esperados)
+
+        if recall(encontrados, esperados, LIMITE_EVALUACION) < 1:
+            fallas.append({
+                'mensaje': consulta['mensaje'],
+                'faltantes': [nombre for nombre in consulta['esperados'] if normalizar(nombre) not in encontrados],
+                'encontrados': [item['producto'].get('nombre', '') for item in resultados]
+            })
+
+    latencia = resumir(medir(
+        app.buscar_productos_relevantes,
+        [(consulta['mensaje'], app.LIMITE_POR_DEFECTO, motor) for consulta in consultas],
+        repeticiones
+    ))
+    return {
+        **{metrica: round(suma / len(consultas), 4) for metrica, suma in sumas.items()},
+        'latencia': latencia,
+        'fallas': fallas
+    }
+
+
+def comparar(actual, anterior, tolerancia):
+    """Líneas de diferencias por motor y si alguna métrica bajó más que la tolerancia"""
+    lineas = []
+    empeoro = False
+    for motor, medidas in actual['motores'].items():
+        previas = anterior.get('motores', {}).get(motor)
+        if previas is None:
+            lineas.append(f"   {motor}: sin resultado anterior")
+            continue
+        for metrica in METRICAS_COMPARADAS:
+            diferencia = medidas[metrica] - previas[metrica]
+            if diferencia < -tolerancia:
+                empeoro = True
+            lineas.append(f"   {motor} {metrica}: {previas[metrica]} -> {medidas[metrica]} ({diferencia:+.4f})")
+        lineas.append(
+            f"   {motor} p50: {previas['latencia']['p50_ms']} -> {medidas['latencia']['p50_ms']} ms"
+        )
+    return lineas, empeoro
+
+
+def main():
+    parser = argparse.ArgumentParser(description='recall@k y MRR de los motores de búsqueda')
+    parser.add_argument('--consultas', default=ARCHIVO_CONSULTAS, help='Consultas etiquetadas (JSON)')
+    parser.add_argument('--motores', default=','.join(MOTORES), help=f'Motores a evaluar (por defecto {",".join(MOTORES)})')
+    parser.add_argument('--repeticiones', type=int, default=20, help='Vueltas para medir la latencia (por defecto 20)')
+    parser.add_argument('--salida', help='Guardar los resultados en este archivo JSON')
+    parser.add_argument('--comparar', help='Resultado anterior (JSON de --salida) contra el que comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.0, help='Baja máxima aceptada de recall@5 y MRR')
+    opciones = parser.parse_args()
+
+    motores = [motor for motor in opciones.motores.split(',') if motor]
+    desconocidos = [motor for motor in motores if motor not in MOTORES]
+    if desconocidos:
+        sys.exit(f'Motores desconocidos: {", ".join(desconocidos)}. Opciones: {", ".join(MOTORES)}')
+
+    consultas = leer_consultas(opciones.consultas, app.catalogo['productos'])
+    resultados = {
+        'commit': version_codigo(),
+        'consultas': len(consultas),
+        'motores': {motor: evaluar_motor(motor, consultas, opciones.repeticiones) for motor in motores}
+    }
+
+    print(f"📊 {len(consultas)} consultas etiquetadas")
+    print(f"   {'motor':<12}" + ''.join(f"{f'recall@{k}':>11}" for k in VALORES_K) + f"{'mrr':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for motor, medidas in resultados['motores'].items():
+        print(f"   {motor:<12}" + ''.join(f"{medidas[f'recall@{k}']:>11.3f}" for k in VALORES_K)
+              + f"{medidas['mrr']:>8.3f}{medidas['latencia']['p50_ms']:>9.3f}{medidas['latencia']['p95_ms']:>9.3f}")
+    for motor, medidas in resultados['motores'].items():
+        for falla in medidas['fallas']:
+            print(f"   ⚠️ {motor} '{falla['mensaje']}': faltan {'; '.join(falla['faltantes'])}")
+
+    if opciones.salida:
+        with open(opciones.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"✅ Resultados en {opciones.salida}")
+
+    if opciones.comparar:
+        with open(opciones.comparar, 'r', encoding='utf-8') as f:
+            anterior = json.load(f)
+        lineas, empeoro = comparar(resultados, anterior, opciones.tolerancia)
+        print(f"🔍 Comparación con {opciones.comparar}:")
+        print('\n'.join(lineas))
+        if empeoro:
+            sys.exit('❌ La relevancia bajó respecto del resultado anterior')
+        print('✅ La relevancia no bajó')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# Preguntas frecuentes e información de la empresa (respuestas.json + empresa.json)
+import json
+import logging
+
+from analizador import analizar
+from normalizacion import normalizar
+
+logger = logging.getLogger(__name__)
+
+# Secciones de empresa.json que responden preguntas directas, con sus palabras clave
+INTENCIONES_EMPRESA = {
+    'horarios': ('horario', 'horarios', 'hora', 'abren', 'cierran', 'abierto', 'atencion', 'atienden'),
+    'contacto': ('contacto', 'contactar', 'contactarlos', 'telefono', 'email', 'correo', 'whatsapp',
+                 'direccion', 'ubicacion', 'ubicados', 'llamar')
+}
+
+# Palabras de pregunta que pueden acompañar a una palabra clave ("¿cuál es su horario?")
+PALABRAS_PREGUNTA = frozenset(analizar(normalizar(
+    'cual cuales cuanto cuanta cuesta cuestan como donde quisiera saber informacion '
+    'ofrecen tienen hacen trabajan dan manejan puedo podria favor gracias'
+)))
+
+TITULO_FAQ = "=== INFORMACIÓN ==="
+
+# Cierre del contexto general: qué datos pedir al cliente para buscar productos
+SUGERENCIAS = """💡 Para ayudarte mejor, por favor especifica:
+- ¿Qué tipo de producto buscas?
+- ¿Para qué aplicación? (tortillas, pan, etc.)
+- ¿Tienes alguna necesidad específica?"""
+
+
+# Contexto general de TIA, mientras empresa.json no tenga los datos de la empresa
+CONTEXTO_GENERAL = f"""=== INFORMACIÓN GENERAL TIA ===
+
+Somos TIA (Tecnología en Ingredientes Alimenticios, S.A de C.V), empresa 100% mexicana.
+
+🏭 NUESTROS PRODUCTOS:
+• Mejoradores para tortillas y pan
+• Conservadores para mayor vida útil
+• Productos antiadherentes
+• Aditivos especializados para panadería
+• Insumos para tortillería
+
+{SUGERENCIAS}"""
+
+
+def leer_json(ruta):
+    """Leer un archivo JSON de información (dict vacío si no existe o no es válido)"""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"⚠️ {ruta} no encontrado")
+        return {}
+    except ValueError as e:
+        logger.warning(f"⚠️ {ruta} no es JSON válido: {e}")
+        return {}
+    return datos if isinstance(datos, dict) else {}
+
+
+def titulo_clave(clave):
+    """'lunes_viernes' -> 'Lunes viernes'"""
+    return clave.replace('_', ' ').capitalize()
+
+
+def formatear_valor(valor, sangria='• '):
+    """Líneas de texto de un valor de JSON (dicts y listas anidados como viñetas)"""
+    if isinstance(valor, dict):
+        lineas = []
+        for clave, subvalor in valor.items():
+            if isinstance(subvalor, (dict, list)):
+                lineas.append(f"{sangria}{titulo_clave(clave)}:")
+                lineas.extend(formatear_valor(subvalor, '   ' + sangria))
+            else:
+                lineas.append(f"{sangria}{titulo_clave(clave)}: {subvalor}")
+        return lineas
+    if isinstance(valor, list):
+        return [f"{sangria}{', '.join(str(elemento) for elemento in valor)}"] if valor else []
+    return [f"{sangria}{valor}"]
+
+
+def terminos(texto):
+    """Raíces de un texto (mismo analizador que la búsqueda de productos)"""
+    return tuple(analizar(normalizar(texto)))
+
+
+def resolver_intencion(nombre, respuestas):
+    """Clave de respuestas_frecuentes de un grupo de keywords_mapping ('precio' -> 'precios')"""
+    raices = terminos(nombre)
+    for clave in respuestas:
+        if terminos(clave) == raices:
+            return clave
+    # Grupos con otro nombre: se buscan en el texto de la pregunta ('remoto' -> '¿Trabajan de forma remota?')
+    for clave, entrada in respuestas.items():
+        if set(raices) <= set(terminos(entrada.get('pregunta', ''))):
+            return clave
+    return None
+
+
+def construir_contexto_general(empresa):
+    """Contexto de respaldo (consultas sin productos) a partir de empresa.json (el fijo de TIA si no hay datos)"""
+    datos = empresa.get('empresa', {})
+    if not datos:
+        return CONTEXTO_GENERAL
+    nombre = datos.get('nombre')
+    partes = [f"=== INFORMACIÓN GENERAL {nombre} ===" if nombre else "=== INFORMACIÓN GENERAL ==="]
+
+    if datos.get('descripcion'):
+        partes.append(f"{nombre}: {datos['descripcion']}." if nombre else f"{datos['descripcion']}.")
+
+    servicios = [
+        f"• {servicio.get('descripcion', titulo_clave(clave))}"
+        for clave, servicio in empresa.get('servicios', {}).items() if isinstance(servicio, dict)
+    ]
+    if servicios:
+        partes.append("🏭 NUESTROS SERVICIOS:\n" + "\n".join(servicios))
+
+    if empresa.get('contacto'):
+        partes.append("📞 CONTACTO:\n" + "\n".join(formatear_valor(empresa['contacto'])))
+
+    partes.append(SUGERENCIAS)
+    return "\n\n".join(partes)
+
+
+def construir_indice_faq(respuestas, empresa):
+    """Precalcular raíz / frase de palabras clave -> intención y el texto de cada intención"""
+    frecuentes = {
+        clave: entrada for clave, entrada in respuestas.get('respuestas_frecuentes', {}).items()
+        if isinstance(entrada, dict) and entrada.get('respuesta')
+    }
+    textos = {
+        clave: f"❓ {entrada.get('pregunta', titulo_clave(clave))}\n💬 {entrada['respuesta']}"
+        for clave, entrada in frecuentes.items()
+    }
+    palabras_clave = {clave: [clave] for clave in frecuentes}
+
+    for nombre, palabras in respuestas.get('keywords_mapping', {}).items():
+        clave = resolver_intencion(nombre, frecuentes)
+        if clave is None:
+            logger.warning(f"⚠️ Grupo de palabras clave sin respuesta: {nombre}")
+            continue
+        palabras_clave[clave].extend(palabras)
+
+    for seccion, palabras in INTENCIONES_EMPRESA.items():
+        if empresa.get(seccion):
+            textos[seccion] = "\n".join([f"📌 {titulo_clave(seccion)}:"] + formatear_valor(empresa[seccion]))
+            palabras_clave[seccion] = list(palabras)
+
+    # Una palabra clave -> raíz; varias ("forma de pago") -> frase que debe aparecer completa
+    por_termino = {}
+    frases = []
+    for clave, palabras in palabras_clave.items():
+        for palabra in palabras:
+            raices = terminos(palabra)
+            if len(raices) == 1:
+                por_termino.setdefault(raices[0], clave)
+            elif raices:
+                frases.append((frozenset(raices), clave))
+
+    return {
+        'terminos': por_termino,
+        'frases': tuple(frases),
+        'vocabulario': frozenset(por_termino).union(*(raices for raices, _ in frases)) | PALABRAS_PREGUNTA,
+        'textos': textos,
+        'general': construir_contexto_general(empresa)
+    }
+
+
+def buscar_intenciones(indice, mensaje_lower):
+    """Intenciones de una pregunta general, en orden de aparición
+
+    Vacío si alguna palabra del mensaje no es de preguntas frecuentes (entonces
+    la consulta es sobre productos y sigue a la búsqueda normal).
+    """
+    raices = analizar(mensaje_lower)
+    if not raices or not indice['vocabulario'].issuperset(raices):
+        return []
+
+    intenciones = [indice['terminos'][termino] for termino in raices if termino in indice['terminos']]
+    presentes = set(raices)
+    intenciones.extend(clave for frase, clave in indice['frases'] if frase <= presentes)
+    return list(dict.fromkeys(intenciones))
+
+
+def contexto_intenciones(indice, intenciones):
+    """Contexto con las respuestas de las intenciones encontradas"""
+    return "\n\n".join([TITULO_FAQ] + [indice['textos'][intencion] for intencion in intenciones])
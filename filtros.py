@@ -0,0 +1,112 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+from normalizacion import plegar
+
+# Fuentes por las que se puede filtrar
+FUENTES = ('combined', 'page', 'meli')
+
+# Tamaños de presentación: "5 kg", "20kg", "1.5 Kg", "8 Lts", "1 Litro"
+PATRON_TAMANO = re.compile(r'(\d+(?:[.,]\d+)?)\s*(kg|kilos?|kilogramos?|gr?s?|gramos?|lts?|l|litros?|ml)\b')
+UNIDADES = {
+    'kg': 'kg', 'kilo': 'kg', 'kilos': 'kg', 'kilogramo': 'kg', 'kilogramos': 'kg',
+    'g': 'g', 'gr': 'g', 'grs': 'g', 'gs': 'g', 'gramo': 'g', 'gramos': 'g',
+    'l': 'l', 'lt': 'l', 'lts': 'l', 'litro': 'l', 'litros': 'l',
+    'ml': 'ml'
+}
+
+
+def tamanos(texto):
+    """Tamaños de presentación normalizados de un texto (ej. {'5 kg', '1.5 kg'})"""
+    resultado = set()
+    for cantidad, unidad in PATRON_TAMANO.findall(plegar(texto or '')):
+        resultado.add(f"{float(cantidad.replace(',', '.')):g} {UNIDADES[unidad]}")
+    return resultado
+
+
+def mapa_de_ids(ids, total):
+    """Convertir ids en un mapa de bits (int: bit i = registro i)"""
+    bits = bytearray((total + 7) // 8)
+    for id_registro in ids:
+        bits[id_registro >> 3] |= 1 << (id_registro & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def ids_de_mapa(mapa):
+    """Ids de los bits encendidos de un mapa, en orden"""
+    ids = []
+    for posicion, byte in enumerate(mapa.to_bytes((mapa.bit_length() + 7) // 8, 'little')):
+        while byte:
+            bit = byte & -byte
+            ids.append(posicion * 8 + bit.bit_length() - 1)
+            byte ^= bit
+    return ids
+
+
+def valores_ordenados(pares):
+    """Ordenar pares (valor, id_registro) en dos arreglos paralelos para búsquedas por rango"""
+    pares = sorted(pares)
+    return array('d', (valor for valor, _ in pares)), array('i', (id_registro for _, id_registro in pares))
+
+
+def construir_facetas(registros):
+    """Precalcular los índices de filtros sobre los registros del índice de búsqueda"""
+    total = len(registros)
+    precios = []
+    ratings = []
+    por_fuente = {fuente: [] for fuente in FUENTES}
+    por_tamano = {}
+
+    for id_registro, registro in enumerate(registros):
+        producto = registro['producto']
+        variantes = producto.get('variantes', [])
+
+        # Un producto entra en un rango de precios si alguna de sus variantes entra
+        precios.extend((v['precio'], id_registro) for v in variantes if v.get('precio'))
+        if producto.get('rating'):
+            ratings.append((producto.get('rating'), id_registro))
+
+        for fuente in producto.get('fuentes', ()):
+            por_fuente.setdefault(fuente, []).append(id_registro)
+
+        textos = [producto.get('presentacion', '')] + [v.get('nombre', '') for v in variantes]
+        for tamano in set().union(*(tamanos(texto) for texto in textos)):
+            por_tamano.setdefault(tamano, []).append(id_registro)
+
+    valores_precio, ids_precio = valores_ordenados(precios)
+    valores_rating, ids_rating = valores_ordenados(ratings)
+    return {
+        'total': total,
+        'precios': valores_precio,
+        'ids_precios': ids_precio,
+        'ratings': valores_rating,
+        'ids_ratings': ids_rating,
+        'fuentes': {fuente: mapa_de_ids(ids, total) for fuente, ids in por_fuente.items()},
+        'tamanos': {tamano: mapa_de_ids(ids, total) for tamano, ids in por_tamano.items()}
+    }
+
+
+def mapa_rango(facetas, clave, minimo=None, maximo=None):
+    """Mapa de los registros con algún valor de 'clave' dentro de [minimo, maximo]"""
+    valores = facetas[clave]
+    inicio = 0 if minimo is None else bisect_left(valores, minimo)
+    fin = len(valores) if maximo is None else bisect_right(valores, maximo)
+    return mapa_de_ids(facetas[f'ids_{clave}'][inicio:fin], facetas['total'])
+
+
+def filtrar(facetas, filtros):
+    """Ids de registros que cumplen todos los filtros (None si no hay filtros)"""
+    if not filtros:
+        return None
+
+    mapa = (1 << facetas['total']) - 1
+    if 'precio_min' in filtros or 'precio_max' in filtros:
+        mapa &= mapa_rango(facetas, 'precios', filtros.get('precio_min'), filtros.get('precio_max'))
+    if 'rating_min' in filtros:
+        mapa &= mapa_rango(facetas, 'ratings', filtros['rating_min'])
+    if 'fuente' in filtros:
+        mapa &= facetas['fuentes'].get(filtros['fuente'], 0)
+    if 'presentacion' in filtros:
+        mapa &= facetas['tamanos'].get(filtros['presentacion'], 0)
+    return frozenset(ids_de_mapa(mapa))
@@ -0,0 +1,202 @@
+import re
+
+from filtros import PATRON_TAMANO
+from normalizacion import normalizar
+
+# Textos de relleno que vienen en los JSON cuando falta un dato
+VALORES_FALTANTES = frozenset([
+    'Beneficios faltantes',
+    'Recomendaciones faltantes',
+    'Presentaciones faltantes',
+    'Descripciones faltantes',
+    'Detalle de producto faltante',
+    'Dosis faltantes',
+    'Sin datos en sitio',
+    'Sin URL en sitio',
+    'Sin url en Mercado Libre',
+    'Producto no encontrado en Mercado Libre',
+    'Sin información',
+    'Sin especificación',
+    'No rating disponible',
+    'Aviso de privacidad'
+])
+
+# Tamaño de presentación dentro del nombre de una publicación ("... 5 Kg Tia", "... 20kg")
+PATRON_TAMANO_NOMBRE = re.compile(PATRON_TAMANO.pattern, re.IGNORECASE)
+
+# Marca que algunas publicaciones agregan al final y otras no ("... Nixtamal 5 Litros Tia")
+PATRON_MARCA = re.compile(r'\b(?:de\s+)?tia\b', re.IGNORECASE)
+
+# Campos que se copian del primer registro que los tenga con un valor real
+CAMPOS_PRODUCTO = [
+    'nombre', 'descripcion', 'detalle_prod', 'beneficios',
+    'recomendaciones_uso', 'dosis_tabla', 'url'
+]
+
+
+def es_valor_faltante(valor):
+    """Indicar si un valor está vacío o es un texto de relleno"""
+    if valor is None or valor == '' or valor == []:
+        return True
+    return isinstance(valor, str) and valor.strip() in VALORES_FALTANTES
+
+
+def a_numero(valor):
+    """Convertir precio/rating a float (None si no es numérico)"""
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    try:
+        return float(str(valor).replace('$', '').replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def separar_urls(texto):
+    """Separar un campo de URLs separadas por ';'"""
+    if es_valor_faltante(texto) or not isinstance(texto, str):
+        return []
+    return [url.strip() for url in texto.split(';') if url.strip()]
+
+
+def quitar_tamano(nombre):
+    """Nombre de una publicación sin su tamaño ('Espesante Para Salsa 5 Kg Tia' -> 'Espesante Para Salsa Tia')"""
+    sin_tamano = ' '.join(PATRON_TAMANO_NOMBRE.sub(' ', nombre).split())
+    return re.sub(r'\s+([,;.])', r'\1', sin_tamano)
+
+
+def clave_producto(producto):
+    """Clave canónica de un producto de combined/page (nombre normalizado)"""
+    nombre = producto.get('nombre', '')
+    if es_valor_faltante(nombre):
+        # Productos que solo existen en MercadoLibre: se identifican por el nombre de la publicación
+        # sin tamaño ni marca, para que cada tamaño (1 Kg, 5 Kg, 20 Kg) sea una variante del mismo producto
+        nombre = PATRON_MARCA.sub(' ', quitar_tamano(producto.get('prod_mercado', '')))
+    return normalizar(nombre)
+
+
+def nuevo_producto(clave):
+    """Producto fusionado vacío"""
+    return {
+        'clave': clave,
+        'variantes': [],
+        'presentaciones': [],
+        'fuentes': []
+    }
+
+
+def completar_campos(fusionado, producto):
+    """Copiar los campos que aún no tienen un valor real"""
+    for campo in CAMPOS_PRODUCTO:
+        valor = producto.get(campo)
+        if es_valor_faltante(valor):
+            continue
+        # dosis_tabla: se prefiere la lista real del sitio sobre el texto de combined.json
+        es_mejor_dosis = campo == 'dosis_tabla' and isinstance(valor, list) and not isinstance(fusionado.get(campo), list)
+        if es_valor_faltante(fusionado.get(campo)) or es_mejor_dosis:
+            fusionado[campo] = valor
+
+    presentacion = producto.get('presentacion')
+    if not es_valor_faltante(presentacion) and presentacion not in fusionado['presentaciones']:
+        fusionado['presentaciones'].append(presentacion)
+
+
+def agregar_fuente(fusionado, fuente):
+    """Registrar que el producto aparece en una fuente"""
+    if fuente not in fusionado['fuentes']:
+        fusionado['fuentes'].append(fuente)
+
+
+def fusionar_catalogos(productos_combined, productos_page, productos_meli):
+    """Unir combined, page y MercadoLibre en un registro por producto con todas sus variantes"""
+    productos = {}
+    variantes_por_nombre = {}
+    variantes_por_url = {}
+
+    # combined: cada registro es una variante (presentación/precio) de un producto
+    for producto in productos_combined:
+        clave = clave_producto(producto)
+        fusionado = productos.setdefault(clave, nuevo_producto(clave))
+        if es_valor_faltante(producto.get('nombre')) and es_valor_faltante(fusionado.get('nombre')):
+            # Sin nombre de producto: el de la publicación sin el tamaño (el tamaño es de cada variante)
+            fusionado['nombre'] = quitar_tamano(producto.get('prod_mercado', ''))
+        completar_campos(fusionado, producto)
+        agregar_fuente(fusionado, 'combined')
+
+        nombre_variante = producto.get('prod_mercado')
+        if es_valor_faltante(nombre_variante):
+            nombre_variante = producto.get('nombre', '')
+        variante = {
+            'nombre': nombre_variante,
+            'precio': a_numero(producto.get('precio')),
+            'rating': a_numero(producto.get('rating')),
+            'urls': separar_urls(producto.get('url_meli'))
+        }
+        fusionado['variantes'].append(variante)
+
+        if not es_valor_faltante(producto.get('prod_mercado')):
+            variantes_por_nombre[normalizar(producto['prod_mercado'])] = (fusionado, variante)
+        for url in variante['urls']:
+            variantes_por_url[url] = (fusionado, variante)
+
+    # page: datos del sitio web, se unen por nombre
+    for producto in productos_page:
+        clave = clave_producto(producto)
+        fusionado = productos.setdefault(clave, nuevo_producto(clave))
+        completar_campos(fusionado, producto)
+        agregar_fuente(fusionado, 'page')
+
+    # MercadoLibre: cada publicación se resuelve a su variante por nombre o por URL
+    for publicacion in productos_meli:
+        urls = separar_urls(publicacion.get('url'))
+        encontrado = variantes_por_nombre.get(normalizar(publicacion.get('nombre', '')))
+        if encontrado is None:
+            encontrado = next((variantes_por_url[url] for url in urls if url in variantes_por_url), None)
+
+        if encontrado is None:
+            # Publicación sin producto en combined/page: producto propio
+            clave = normalizar(publicacion.get('nombre', ''))
+            fusionado = productos.setdefault(clave, nuevo_producto(clave))
+            variante = {'nombre': publicacion.get('nombre', ''), 'precio': None, 'rating': None, 'urls': []}
+            fusionado['variantes'].append(variante)
+        else:
+            fusionado, variante = encontrado
+
+        completar_campos(fusionado, {
+            'nombre': publicacion.get('nombre', ''),
+            'descripcion': publicacion.get('descripcion', ''),
+            'url': urls[0] if urls else ''
+        })
+        agregar_fuente(fusionado, 'meli')
+        if variante['precio'] is None:
+            variante['precio'] = a_numero(publicacion.get('precio'))
+        if variante['rating'] is None:
+            variante['rating'] = a_numero(publicacion.get('rating'))
+        for url in urls:
+            if url not in variante['urls']:
+                variante['urls'].append(url)
+
+    return [finalizar_producto(fusionado) for fusionado in productos.values()]
+
+
+def finalizar_producto(fusionado):
+    """Calcular los campos de resumen (precio mínimo, rating, presentación)"""
+    if es_valor_faltante(fusionado.get('nombre')):
+        fusionado['nombre'] = fusionado['variantes'][0]['nombre'] if fusionado['variantes'] else 'Sin nombre'
+
+    precios = [v['precio'] for v in fusionado['variantes'] if v['precio']]
+    ratings = [v['rating'] for v in fusionado['variantes'] if v['rating']]
+
+    fusionado['precio'] = min(precios) if precios else None
+    fusionado['rating'] = max(ratings) if ratings else None
+    fusionado['presentacion'] = ' | '.join(fusionado['presentaciones'])
+    return fusionado
+
+
+def agrupar_por_fuente(productos):
+    """Agrupar productos fusionados por su fuente principal, en el formato del índice"""
+    grupos = {}
+    for producto in productos:
+        grupos.setdefault(producto['fuentes'][0], []).append(producto)
+    return list(grupos.items())
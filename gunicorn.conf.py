@@ -0,0 +1,36 @@
+"""
+Configuración de gunicorn para producción
+
+    gunicorn -c gunicorn.conf.py app:app                                      (WSGI, hilos)
+    gunicorn -c gunicorn.conf.py -k uvicorn_worker.UvicornWorker asgi:asgi_app  (ASGI)
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('THREADS', 8))
+timeout = int(os.environ.get('TIMEOUT', 30))
+keepalive = 5
+
+# Cargar los JSON y construir los índices una sola vez en el proceso maestro;
+# los workers heredan el catálogo por fork en lugar de leerlo cada uno.
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Mover los objetos ya cargados (catálogo e índices) a la generación permanente del
+    # GC: el recolector de cada worker no los recorre y no escribe en esas páginas, así
+    # siguen compartidas (copy-on-write) entre todos los workers.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Los hilos no sobreviven al fork: cada worker arranca su propio vigilante de
+    # catálogos y su propio hilo escritor de logs
+    import app
+    import bitacora
+    bitacora.iniciar_escritor()
+    app.vigilante_catalogos.iniciar()
@@ -0,0 +1,325 @@
+import math
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from trigramas import trigramas, construir_indice_trigramas, terminos_similares, aplanar_trigramas
+from normalizacion import normalizar
+from analizador import analizar, construir_mapa_sinonimos, SINONIMOS_POR_DEFECTO, PESO_SINONIMO
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él no hay motor TF-IDF vectorizado
+    np = None
+
+# Campos de texto que se usan para la búsqueda por palabras clave
+CAMPOS_TEXTO = ['nombre', 'descripcion', 'detalle_prod', 'beneficios']
+
+
+def construir_registro(producto, fuente):
+    """Construir el registro de búsqueda pre-normalizado de un producto"""
+    campos_busqueda = [producto.get(campo, '') for campo in CAMPOS_TEXTO]
+    categorias = producto.get('categorias')
+    campos_busqueda.append(' '.join(categorias) if isinstance(categorias, list) else '')
+    # Nombres de las publicaciones de cada variante (ej. "Acelerante 1kg Tortilla Harina De Trigo Tia")
+    variantes = producto.get('variantes')
+    campos_busqueda.append(' '.join(v['nombre'] for v in variantes) if isinstance(variantes, list) else '')
+
+    texto_completo = normalizar(' '.join(campos_busqueda))
+    nombre = normalizar(producto.get('nombre', ''))
+    descripcion = normalizar(producto.get('descripcion', ''))
+    # Términos del índice: raíces sin palabras vacías ("tortillas" y "tortilla" -> "tortill")
+    terminos = analizar(texto_completo)
+
+    return {
+        'producto': producto,
+        'fuente': fuente,
+        'nombre': nombre,
+        'descripcion': descripcion,
+        'terminos_nombre': analizar(nombre),
+        'terminos_descripcion': analizar(descripcion),
+        'terminos': terminos,
+        'tokens': frozenset(terminos),
+        'trigramas_nombre': trigramas(nombre),
+        'trigramas_descripcion': trigramas(descripcion)
+    }
+
+
+def construir_registros(productos_por_fuente):
+    """Construir los registros de búsqueda para varias fuentes, en orden"""
+    registros = []
+    for fuente, productos in productos_por_fuente:
+        for producto in productos:
+            registros.append(construir_registro(producto, fuente))
+    return registros
+
+
+# Peso de una coincidencia de palabra clave según el campo donde aparece
+PESO_NOMBRE = 2.0
+PESO_DESCRIPCION = 1.0
+PESO_OTROS = 0.5
+
+# Máximo de palabras de consulta cuya expansión a términos se guarda en cache
+MAX_CACHE_SUBCADENAS = 4096
+
+
+def aplanar_postings(postings, tipo_valor='f'):
+    """Convertir {término: {id_producto: valor}} en arreglos planos (formato CSR)"""
+    # Con arreglos planos los workers creados por fork leen el índice sin tocar
+    # contadores de referencias de millones de objetos (no se copian páginas).
+    vocabulario = {}
+    indptr = array('q', [0])
+    ids = array('i')
+    valores = array(tipo_valor)
+
+    for id_termino, (termino, por_producto) in enumerate(postings.items()):
+        vocabulario[termino] = id_termino
+        for id_producto in sorted(por_producto):
+            ids.append(id_producto)
+            valores.append(por_producto[id_producto])
+        indptr.append(len(ids))
+
+    return {
+        'vocabulario': vocabulario,
+        'indptr': indptr,
+        'ids': ids,
+        'valores': valores
+    }
+
+
+def recorrer_posting(plano, id_termino):
+    """Recorrer los pares (id_producto, valor) de un término del índice plano"""
+    inicio, fin = plano['indptr'][id_termino], plano['indptr'][id_termino + 1]
+    return zip(plano['ids'][inicio:fin], plano['valores'][inicio:fin])
+
+
+def construir_indice_invertido(registros):
+    """Construir el índice invertido término -> {id_producto: peso del campo}"""
+    postings = {}
+
+    for id_producto, registro in enumerate(registros):
+        tokens_nombre = set(registro['terminos_nombre'])
+        tokens_descripcion = set(registro['terminos_descripcion'])
+
+        for token in registro['tokens']:
+            if token in tokens_nombre:
+                peso = PESO_NOMBRE
+            elif token in tokens_descripcion:
+                peso = PESO_DESCRIPCION
+            else:
+                peso = PESO_OTROS
+            postings.setdefault(token, {})[id_producto] = peso
+
+    indice = aplanar_postings(postings)
+
+    # Vocabulario en un solo string: la búsqueda por subcadena es un str.find
+    terminos = list(postings)
+    inicios = array('q')
+    posicion = 0
+    for termino in terminos:
+        inicios.append(posicion)
+        posicion += len(termino) + 1
+
+    indice.update({
+        'texto_terminos': '\n'.join(terminos) + '\n',
+        'inicios_terminos': inicios,
+        'cache_subcadenas': {},
+        'trigramas': construir_indice_trigramas(terminos)
+    })
+    return indice
+
+
+def terminos_que_contienen(indice, palabra):
+    """Obtener los ids de los términos del vocabulario que contienen la palabra"""
+    cache = indice['cache_subcadenas']
+    ids_terminos = cache.get(palabra)
+    if ids_terminos is None:
+        ids_terminos = []
+        texto = indice['texto_terminos']
+        inicios = indice['inicios_terminos']
+        posicion = texto.find(palabra) if palabra else -1
+        while posicion != -1:
+            id_termino = bisect_right(inicios, posicion) - 1
+            ids_terminos.append(id_termino)
+            # Continuar desde el siguiente término para no repetir este
+            siguiente = id_termino + 1
+            if siguiente >= len(inicios):
+                break
+            posicion = texto.find(palabra, inicios[siguiente])
+        if len(cache) >= MAX_CACHE_SUBCADENAS:
+            cache.clear()
+        cache[palabra] = ids_terminos
+    return ids_terminos
+
+
+def puntuar_palabras_clave(indice, palabras, sinonimos=None):
+    """Calcular el score de palabras clave solo para los productos candidatos"""
+    scores = {}
+    sinonimos = sinonimos or {}
+
+    for palabra in palabras:
+        # Un sinónimo cuenta como coincidencia de la misma palabra, con menos peso
+        coincidencias = [(id_termino, 1.0) for id_termino in terminos_que_contienen(indice, palabra)]
+        coincidencias.extend(
+            (id_termino, PESO_SINONIMO)
+            for sinonimo in sinonimos.get(palabra, ())
+            for id_termino in terminos_que_contienen(indice, sinonimo)
+        )
+        if not coincidencias:
+            # Sin coincidencia exacta: términos parecidos por trigramas (errores de dedo)
+            coincidencias = terminos_similares(indice['trigramas'], palabra)
+
+        # Mejor campo donde aparece la palabra en cada producto
+        mejores = {}
+        for id_termino, similitud in coincidencias:
+            for id_producto, peso in recorrer_posting(indice, id_termino):
+                peso *= similitud
+                if peso > mejores.get(id_producto, 0):
+                    mejores[id_producto] = peso
+
+        for id_producto, peso in mejores.items():
+            scores[id_producto] = scores.get(id_producto, 0) + peso
+
+    return scores
+
+
+# Parámetros de BM25F
+BM25_K1 = 1.2
+BM25_B = 0.75
+PESOS_CAMPOS_BM25 = {'nombre': 3.0, 'descripcion': 1.5, 'otros': 1.0}
+
+
+def leer_pesos_campos(texto):
+    """Leer pesos de campos BM25 con formato 'nombre:3,descripcion:1.5,otros:1'"""
+    pesos = dict(PESOS_CAMPOS_BM25)
+    for parte in (texto or '').split(','):
+        if ':' not in parte:
+            continue
+        campo, valor = parte.split(':', 1)
+        campo = campo.strip()
+        if campo in pesos:
+            pesos[campo] = float(valor)
+    return pesos
+
+
+def frecuencias_por_campo(registro):
+    """Contar las frecuencias de términos de cada campo del registro"""
+    tf_nombre = Counter(registro['terminos_nombre'])
+    tf_descripcion = Counter(registro['terminos_descripcion'])
+    # El texto completo es nombre + descripción + el resto de campos
+    tf_otros = Counter(registro['terminos']) - tf_nombre - tf_descripcion
+    return {'nombre': tf_nombre, 'descripcion': tf_descripcion, 'otros': tf_otros}
+
+
+def construir_indice_bm25(registros, pesos_campos=None, k1=BM25_K1, b=BM25_B):
+    """Precalcular el aporte BM25F de cada término a cada producto"""
+    pesos_campos = pesos_campos or PESOS_CAMPOS_BM25
+    total = len(registros)
+    frecuencias = [frecuencias_por_campo(registro) for registro in registros]
+
+    # Longitud promedio de cada campo
+    longitud_promedio = {}
+    for campo in pesos_campos:
+        suma = sum(sum(tf[campo].values()) for tf in frecuencias)
+        longitud_promedio[campo] = (suma / total) if total and suma else 1.0
+
+    # Frecuencia de término combinada (BM25F) por producto
+    tf_combinada = {}
+    for id_producto, tf in enumerate(frecuencias):
+        for campo, peso in pesos_campos.items():
+            longitud = sum(tf[campo].values())
+            normalizacion = 1 - b + b * longitud / longitud_promedio[campo]
+            for termino, frecuencia in tf[campo].items():
+                por_producto = tf_combinada.setdefault(termino, {})
+                por_producto[id_producto] = por_producto.get(id_producto, 0) + peso * frecuencia / normalizacion
+
+    # IDF y saturación se resuelven aquí para que la consulta sea solo una suma
+    postings = {}
+    for termino, por_producto in tf_combinada.items():
+        df = len(por_producto)
+        idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        postings[termino] = {
+            id_producto: idf * tf / (k1 + tf)
+            for id_producto, tf in por_producto.items()
+        }
+
+    indice = aplanar_postings(postings, 'd')
+    indice.update({
+        # Aporte máximo de cada término: cota superior para la poda MaxScore
+        'maximos': array('d', (max(por_producto.values()) for por_producto in postings.values())),
+        'pesos_campos': dict(pesos_campos),
+        'total_productos': total
+    })
+    return indice
+
+
+def construir_matriz_tfidf(registros):
+    """Construir la matriz dispersa término-documento TF-IDF (una fila por término)"""
+    if np is None:
+        return None
+
+    total = len(registros)
+    frecuencias = [Counter(registro['terminos']) for registro in registros]
+
+    documentos_por_termino = {}
+    for id_producto, tf in enumerate(frecuencias):
+        for termino, frecuencia in tf.items():
+            documentos_por_termino.setdefault(termino, []).append((id_producto, frecuencia))
+
+    vocabulario = {}
+    idf = np.zeros(len(documentos_por_termino), dtype=np.float32)
+    indptr = np.zeros(len(documentos_por_termino) + 1, dtype=np.int64)
+    indices = []
+    datos = []
+
+    for id_termino, (termino, documentos) in enumerate(documentos_por_termino.items()):
+        vocabulario[termino] = id_termino
+        idf[id_termino] = math.log((1 + total) / (1 + len(documentos))) + 1
+        indptr[id_termino + 1] = indptr[id_termino] + len(documentos)
+        for id_producto, frecuencia in documentos:
+            indices.append(id_producto)
+            datos.append((1 + math.log(frecuencia)) * idf[id_termino])
+
+    indices = np.array(indices, dtype=np.int32)
+    datos = np.array(datos, dtype=np.float32)
+
+    # Normalizar cada documento a norma L2 = 1 (similitud coseno)
+    normas = np.sqrt(np.bincount(indices, weights=datos.astype(np.float64) ** 2, minlength=total))
+    normas[normas == 0] = 1.0
+    datos /= normas[indices].astype(np.float32)
+
+    return {
+        'vocabulario': vocabulario,
+        'idf': idf,
+        'indptr': indptr,
+        'indices': indices,
+        'datos': datos,
+        'total_productos': total
+    }
+
+
+# Campos del registro que se usan al consultar (el resto solo sirve para construir los índices;
+# los trigramas de nombre y descripción van en arreglos planos, en 'trigramas')
+CAMPOS_REGISTRO_CONSULTA = ('producto', 'fuente')
+
+
+def compactar_registro(registro):
+    """Quitar del registro los textos que ya están en los índices"""
+    return {campo: registro[campo] for campo in CAMPOS_REGISTRO_CONSULTA}
+
+
+def construir_indice_busqueda(productos_por_fuente, pesos_bm25=None, sinonimos=None):
+    """Construir registros, índice invertido y estadísticas BM25 del catálogo"""
+    registros = construir_registros(productos_por_fuente)
+    return {
+        # Raíz -> raíces sinónimas, para expandir las consultas sin comparaciones extra
+        'sinonimos': construir_mapa_sinonimos(sinonimos or SINONIMOS_POR_DEFECTO),
+        'invertido': construir_indice_invertido(registros),
+        'bm25': construir_indice_bm25(registros, pesos_bm25),
+        'tfidf': construir_matriz_tfidf(registros),
+        # Trigramas de nombre y descripción por registro (ids en formato CSR, motor heurístico)
+        'trigramas': aplanar_trigramas({
+            'nombre': [registro['trigramas_nombre'] for registro in registros],
+            'descripcion': [registro['trigramas_descripcion'] for registro in registros]
+        }),
+        'registros': [compactar_registro(registro) for registro in registros]
+    }
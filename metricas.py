@@ -0,0 +1,170 @@
+# Métricas del servidor (latencias por etapa, productos puntuados) en formato de texto de Prometheus
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+# Límites superiores de los buckets (segundos) de las latencias por etapa
+# (la mayoría de las etapas tarda menos de un milisegundo)
+BUCKETS_LATENCIA = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Límites de los buckets de productos puntuados por consulta
+BUCKETS_PRODUCTOS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Cuantiles que se estiman a partir de los buckets
+CUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histograma:
+    """Conteo de observaciones por bucket, con suma y total (sin guardar cada valor)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)  # El último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def cuantil(self, q):
+        """Estimar un cuantil interpolando dentro de su bucket (como histogram_quantile)"""
+        if not self.total:
+            return None
+        objetivo = q * self.total
+        acumulado = 0
+        for posicion, conteo in enumerate(self.conteos):
+            if acumulado + conteo >= objetivo and conteo:
+                if posicion == len(self.buckets):
+                    return self.buckets[-1]  # Por encima del último bucket
+                inicio = self.buckets[posicion - 1] if posicion else 0.0
+                return inicio + (self.buckets[posicion] - inicio) * (objetivo - acumulado) / conteo
+            acumulado += conteo
+        return self.buckets[-1]
+
+
+def formatear_etiquetas(etiquetas):
+    """{'etapa': 'busqueda'} -> '{etapa="busqueda"}'"""
+    if not etiquetas:
+        return ''
+    return '{' + ','.join(f'{clave}="{valor}"' for clave, valor in etiquetas) + '}'
+
+
+def formatear_numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Metricas:
+    """Histogramas y contadores con etiquetas; sin efecto (ni costo) si está desactivado"""
+
+    def __init__(self, activo=True):
+        self.activo = activo
+        self._histogramas = {}  # (nombre, etiquetas) -> Histograma
+        self._contadores = {}   # (nombre, etiquetas) -> int
+        self._ayudas = {}
+        self._lock = threading.Lock()
+
+    def describir(self, nombre, ayuda):
+        self._ayudas[nombre] = ayuda
+
+    def observar(self, nombre, valor, buckets=BUCKETS_LATENCIA, **etiquetas):
+        if not self.activo:
+            return
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = Histograma(buckets)
+            histograma.observar(valor)
+
+    def contar(self, nombre, cantidad=1, **etiquetas):
+        if not self.activo:
+            return
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + cantidad
+
+    @contextmanager
+    def _medir(self, nombre, etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def medir(self, nombre, **etiquetas):
+        """Context manager que observa la duración del bloque en segundos"""
+        if not self.activo:
+            return nullcontext()
+        return self._medir(nombre, etiquetas)
+
+    def cuantiles(self, nombre):
+        """{etiquetas: {'p50': ..., 'p95': ..., 'p99': ...}} de un histograma"""
+        with self._lock:
+            return {
+                ','.join(str(valor) for _, valor in etiquetas) or nombre: {
+                    f'p{round(q * 100)}': round(histograma.cuantil(q), 6) for q in CUANTILES
+                }
+                for (nombre_histograma, etiquetas), histograma in sorted(self._histogramas.items())
+                if nombre_histograma == nombre
+            }
+
+    def exportar(self, indicadores=()):
+        """Texto de exposición de Prometheus
+
+        'indicadores' son valores leídos al exportar (tamaños del catálogo, cache):
+        [(nombre, tipo, ayuda, [(etiquetas, valor)])].
+        """
+        lineas = []
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted(self._histogramas.items())
+
+            for nombre in dict.fromkeys(nombre for (nombre, _), _ in contadores):
+                lineas.append(f'# HELP {nombre} {self._ayudas.get(nombre, nombre)}')
+                lineas.append(f'# TYPE {nombre} counter')
+                lineas.extend(
+                    f'{nombre}{formatear_etiquetas(etiquetas)} {valor}'
+                    for (nombre_contador, etiquetas), valor in contadores if nombre_contador == nombre
+                )
+
+            for nombre in dict.fromkeys(nombre for (nombre, _), _ in histogramas):
+                lineas.append(f'# HELP {nombre} {self._ayudas.get(nombre, nombre)}')
+                lineas.append(f'# TYPE {nombre} histogram')
+                for (nombre_histograma, etiquetas), histograma in histogramas:
+                    if nombre_histograma != nombre:
+                        continue
+                    acumulado = 0
+                    for limite, conteo in zip(histograma.buckets + ('+Inf',), histograma.conteos):
+                        acumulado += conteo
+                        lineas.append(f'{nombre}_bucket{formatear_etiquetas(etiquetas + (("le", limite),))} {acumulado}')
+                    lineas.append(f'{nombre}_sum{formatear_etiquetas(etiquetas)} {histograma.suma!r}')
+                    lineas.append(f'{nombre}_count{formatear_etiquetas(etiquetas)} {histograma.total}')
+
+                # Cuantiles estimados de los buckets, para tableros sin histogram_quantile
+                lineas.append(f'# HELP {nombre}_cuantil Cuantiles estimados de {nombre}')
+                lineas.append(f'# TYPE {nombre}_cuantil gauge')
+                for (nombre_histograma, etiquetas), histograma in histogramas:
+                    if nombre_histograma != nombre:
+                        continue
+                    for q in CUANTILES:
+                        valor = histograma.cuantil(q)
+                        if valor is not None:
+                            lineas.append(f'{nombre}_cuantil{formatear_etiquetas(etiquetas + (("quantile", q),))} {valor!r}')
+
+        for nombre, tipo, ayuda, valores in indicadores:
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+            lineas.extend(f'{nombre}{formatear_etiquetas(tuple(etiquetas))} {formatear_numero(valor)}' for etiquetas, valor in valores)
+
+        return '\n'.join(lineas) + '\n'
+
+
+# Métricas del proceso (con gunicorn, cada worker expone las suyas). METRICAS=0 las desactiva.
+metricas = Metricas(activo=os.environ.get('METRICAS', '1') != '0')
+metricas.describir('tia_etapa_segundos', 'Duración de cada etapa de /consultar en segundos')
+metricas.describir('tia_productos_puntuados', 'Productos puntuados por el motor de ranking en cada búsqueda')
+metricas.describir('tia_consultas_total', 'Consultas respondidas por origen de la respuesta')
@@ -0,0 +1,219 @@
+import heapq
+import os
+from indice import np, puntuar_palabras_clave, recorrer_posting
+from trigramas import trigramas, ids_trigramas, cantidad_trigramas, similitud_plana
+from analizador import analizar, expandir
+from metricas import metricas, BUCKETS_PRODUCTOS
+
+# Motor de ranking usado cuando la petición no indica uno
+MOTOR_POR_DEFECTO = os.environ.get('MOTOR_BUSQUEDA', 'heuristico')
+
+
+class MejoresK:
+    """Los k mejores (id_producto, score) en un heap acotado; cada producto entra una sola vez"""
+
+    def __init__(self, k):
+        self.k = k
+        # Entradas (score, -id): la raíz es el peor seleccionado (a igual score, el id mayor)
+        self._heap = []
+        self._ids = set()
+
+    def lleno(self):
+        return len(self._heap) >= self.k
+
+    def puede_entrar(self, cota):
+        """Indicar si un producto con score a lo sumo 'cota' podría quedar entre los k mejores"""
+        if self.k <= 0:
+            return False
+        return not self.lleno() or cota >= self._heap[0][0]
+
+    def agregar(self, id_producto, score):
+        if self.k <= 0 or id_producto in self._ids:
+            return
+        entrada = (score, -id_producto)
+        if not self.lleno():
+            heapq.heappush(self._heap, entrada)
+        elif entrada > self._heap[0]:
+            _, id_saliente = heapq.heapreplace(self._heap, entrada)
+            self._ids.discard(-id_saliente)
+        else:
+            return
+        self._ids.add(id_producto)
+
+    def resultado(self):
+        """Seleccionados de mayor a menor score (a igual score, por id)"""
+        return [(-id_negativo, score) for score, id_negativo in sorted(self._heap, reverse=True)]
+
+
+def cota_similitud(tamano_a, tamano_b):
+    """Similitud máxima posible entre dos conjuntos de trigramas según sus tamaños"""
+    if not tamano_a or not tamano_b:
+        return 0.0
+    return min(tamano_a, tamano_b) / max(tamano_a, tamano_b)
+
+
+def palabras_significativas(mensaje_lower):
+    """Obtener las raíces del mensaje que se usan como palabras clave (sin palabras vacías)"""
+    # Se buscan como subcadena: con menos de 3 letras coincidirían con casi todo
+    return list(dict.fromkeys(termino for termino in analizar(mensaje_lower) if len(termino) > 2))
+
+
+def rankear_heuristico(indice_busqueda, mensaje_lower, limite, permitidos=None):
+    """Ranking original: similitud por trigramas + palabras clave (solo los 'limite' mejores)"""
+    registros = indice_busqueda['registros']
+    indice_trigramas = indice_busqueda['trigramas']
+    trigramas_nombre = indice_trigramas['nombre']
+    trigramas_descripcion = indice_trigramas['descripcion']
+    palabras_mensaje = palabras_significativas(mensaje_lower)
+    trigramas_mensaje = trigramas(mensaje_lower)
+
+    # Solo se puntúan los productos que comparten alguna palabra con el mensaje
+    # (nombre = 2.0, descripción = 1.0, otros campos = 0.5 por palabra)
+    keyword_scores = puntuar_palabras_clave(indice_busqueda['invertido'], palabras_mensaje, indice_busqueda['sinonimos'])
+    if palabras_mensaje:
+        candidatos = sorted(keyword_scores)
+    else:
+        # Mensajes sin palabras significativas: revisar todo el catálogo
+        candidatos = range(len(registros))
+
+    # Filtros de la petición: se descartan antes de calcular cualquier similitud
+    if permitidos is not None:
+        candidatos = [id_producto for id_producto in candidatos if id_producto in permitidos]
+
+    # Cota superior del score de cada candidato (solo usa tamaños de conjuntos):
+    # se puntúan primero los de cota más alta y se corta cuando ninguno puede
+    # superar al k-ésimo seleccionado (poda al estilo MaxScore)
+    tamano_mensaje = len(trigramas_mensaje)
+    cotas = []
+    for id_producto in candidatos:
+        cota_nombre = cota_similitud(tamano_mensaje, cantidad_trigramas(trigramas_nombre, id_producto))
+        cota_descripcion = cota_similitud(tamano_mensaje, cantidad_trigramas(trigramas_descripcion, id_producto))
+        cota = keyword_scores.get(id_producto, 0)
+        if cota_nombre > 0.3:
+            cota += cota_nombre * 3
+        if cota_descripcion > 0.2:
+            cota += cota_descripcion * 1.5
+        cotas.append((-cota, id_producto))
+    cotas.sort()
+
+    # Trigramas de la consulta como ids del vocabulario plano (los ausentes solo cuentan en el tamaño)
+    ids_mensaje = ids_trigramas(indice_trigramas, trigramas_mensaje)
+
+    mejores = MejoresK(limite)
+    puntuados = 0
+    for cota_negativa, id_producto in cotas:
+        cota = -cota_negativa
+        if cota <= 0.5 or not mejores.puede_entrar(cota):
+            break
+        puntuados += 1
+        score = 0
+
+        # Búsqueda por similitud en nombre
+        nombre_similarity = similitud_plana(ids_mensaje, tamano_mensaje, trigramas_nombre, id_producto)
+        if nombre_similarity > 0.3:
+            score += nombre_similarity * 3  # Peso alto al nombre
+
+        # Búsqueda por similitud en descripción
+        desc_similarity = similitud_plana(ids_mensaje, tamano_mensaje, trigramas_descripcion, id_producto)
+        if desc_similarity > 0.2:
+            score += desc_similarity * 1.5
+
+        # Búsqueda por palabras clave
+        score += keyword_scores.get(id_producto, 0)
+
+        if score > 0.5:  # Umbral mínimo más alto
+            mejores.agregar(id_producto, score)
+
+    metricas.observar('tia_productos_puntuados', puntuados, BUCKETS_PRODUCTOS, motor='heuristico')
+    return mejores.resultado()
+
+
+def terminos_consulta(mensaje_lower, sinonimos):
+    """Obtener los términos distintos de la consulta con su peso: [(raíz o sinónimo, peso)]"""
+    return expandir(list(dict.fromkeys(analizar(mensaje_lower))), sinonimos)
+
+
+def rankear_bm25(indice_busqueda, mensaje_lower, limite, permitidos=None):
+    """Ranking BM25F sobre los aportes precalculados del índice"""
+    bm25 = indice_busqueda['bm25']
+    terminos = [
+        (bm25['vocabulario'][termino], peso)
+        for termino, peso in terminos_consulta(mensaje_lower, indice_busqueda['sinonimos'])
+        if termino in bm25['vocabulario']
+    ]
+
+    # MaxScore: términos de mayor aporte máximo primero; cuando lo que falta sumar
+    # no alcanza al k-ésimo score, los productos nuevos ya no pueden entrar
+    terminos.sort(key=lambda termino: bm25['maximos'][termino[0]] * termino[1], reverse=True)
+    restante = sum(bm25['maximos'][id_termino] * peso for id_termino, peso in terminos)
+    scores = {}
+
+    for id_termino, peso in terminos:
+        solo_existentes = len(scores) >= limite and heapq.nlargest(limite, scores.values())[-1] > restante
+        restante -= bm25['maximos'][id_termino] * peso
+        for id_producto, aporte in recorrer_posting(bm25, id_termino):
+            aporte *= peso
+            if id_producto in scores:
+                scores[id_producto] += aporte
+            elif not solo_existentes and (permitidos is None or id_producto in permitidos):
+                scores[id_producto] = aporte
+
+    metricas.observar('tia_productos_puntuados', len(scores), BUCKETS_PRODUCTOS, motor='bm25')
+    mejores = MejoresK(limite)
+    for id_producto, score in scores.items():
+        mejores.agregar(id_producto, score)
+    return mejores.resultado()
+
+
+def rankear_tfidf(indice_busqueda, mensaje_lower, limite, permitidos=None):
+    """Ranking TF-IDF vectorizado: producto matriz dispersa-vector + argpartition"""
+    matriz = indice_busqueda['tfidf']
+    if matriz is None or not matriz['total_productos']:
+        return []
+
+    terminos = [
+        (matriz['vocabulario'][termino], peso)
+        for termino, peso in terminos_consulta(mensaje_lower, indice_busqueda['sinonimos'])
+        if termino in matriz['vocabulario']
+    ]
+    if not terminos:
+        return []
+    ids_terminos = [id_termino for id_termino, _ in terminos]
+
+    # Vector de consulta: idf de cada término por su peso (los sinónimos pesan menos), normalizado
+    pesos_consulta = matriz['idf'][ids_terminos] * np.array([peso for _, peso in terminos], dtype=np.float32)
+    pesos_consulta = pesos_consulta / np.linalg.norm(pesos_consulta)
+
+    indptr = matriz['indptr']
+    segmentos = [slice(indptr[t], indptr[t + 1]) for t in ids_terminos]
+    documentos = np.concatenate([matriz['indices'][s] for s in segmentos])
+    aportes = np.concatenate([matriz['datos'][s] * peso for s, peso in zip(segmentos, pesos_consulta)])
+    scores = np.bincount(documentos, weights=aportes, minlength=matriz['total_productos'])
+    if permitidos is not None:
+        mascara = np.zeros(len(scores), dtype=bool)
+        mascara[list(permitidos)] = True
+        scores[~mascara] = 0
+    metricas.observar('tia_productos_puntuados', int(np.count_nonzero(scores)), BUCKETS_PRODUCTOS, motor='tfidf')
+
+    k = min(len(scores), limite)
+    mejores = np.argpartition(-scores, k - 1)[:k]
+    mejores = mejores[scores[mejores] > 0]
+    # Mayor score primero; a igual score, por id
+    mejores = mejores[np.lexsort((mejores, -scores[mejores]))]
+
+    return [(int(id_producto), float(scores[id_producto])) for id_producto in mejores]
+
+
+# Motores de ranking disponibles por nombre
+MOTORES = {
+    'heuristico': rankear_heuristico,
+    'bm25': rankear_bm25
+}
+
+# El motor TF-IDF vectorizado solo está disponible si NumPy está instalado
+if np is not None:
+    MOTORES['tfidf'] = rankear_tfidf
+
+# Un MOTOR_BUSQUEDA desconocido (o 'tfidf' sin NumPy) haría fallar toda consulta sin 'motor': se detiene al iniciar
+if MOTOR_POR_DEFECTO not in MOTORES:
+    raise ValueError(f'MOTOR_BUSQUEDA desconocido: "{MOTOR_POR_DEFECTO}". Opciones: {", ".join(MOTORES)}')
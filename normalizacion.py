@@ -0,0 +1,61 @@
+# Normalización de texto para búsqueda: minúsculas, sin acentos ni puntuación, espacios simples
+import string
+import unicodedata
+from functools import lru_cache
+
+# Textos de hasta este largo se guardan en cache (mensajes y nombres se repiten mucho)
+LARGO_MAXIMO_CACHE = 256
+MAX_CACHE_NORMALIZADOS = 16384
+
+# Categorías Unicode que separan palabras: espacios (Z*), puntuación (P*) y símbolos (S*)
+CATEGORIAS_SEPARADORAS = ('Z', 'P', 'S')
+
+
+class TablaSeparadores(dict):
+    """Tabla para str.translate: espacios, puntuación y símbolos fuera de ASCII -> espacio
+
+    Sin ella se perderían al quitar los acentos y pegarían las palabras
+    ('pan🍞dulce' -> 'pandulce'). Cada carácter se clasifica una sola vez.
+    """
+
+    def __missing__(self, codigo):
+        caracter = chr(codigo)
+        if not caracter.isascii() and unicodedata.category(caracter)[0] in CATEGORIAS_SEPARADORAS:
+            self[codigo] = ' '
+        else:
+            self[codigo] = codigo
+        return self[codigo]
+
+
+TABLA_SEPARADORES = TablaSeparadores()
+
+# Signos de puntuación ASCII -> espacio (str.translate, sin expresiones regulares)
+TABLA_PUNTUACION = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+
+
+def quitar_acentos(texto):
+    """Quitar acentos y tildes (á -> a, ñ -> n, ü -> u); el texto ASCII no se toca"""
+    if texto.isascii():
+        return texto
+    # NFD separa cada letra de su acento; al codificar en ASCII se descartan los acentos
+    texto = unicodedata.normalize('NFD', texto).translate(TABLA_SEPARADORES)
+    return texto.encode('ascii', 'ignore').decode('ascii')
+
+
+def plegar(texto):
+    """Minúsculas y sin acentos, conservando la puntuación (ej. "1.5 kg")"""
+    return quitar_acentos(texto.lower()).strip()
+
+
+def _normalizar(texto):
+    return ' '.join(quitar_acentos(texto.lower()).translate(TABLA_PUNTUACION).split())
+
+
+_normalizar_corto = lru_cache(maxsize=MAX_CACHE_NORMALIZADOS)(_normalizar)
+
+
+def normalizar(texto):
+    """Normalizar texto para búsqueda: minúsculas, sin acentos ni puntuación, espacios simples"""
+    if len(texto) <= LARGO_MAXIMO_CACHE:
+        return _normalizar_corto(texto)
+    return _normalizar(texto)
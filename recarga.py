@@ -0,0 +1,56 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def fechas_modificacion(rutas):
+    """Obtener la fecha de modificación (mtime) de cada archivo, None si no existe"""
+    fechas = {}
+    for ruta in rutas:
+        try:
+            fechas[ruta] = os.stat(ruta).st_mtime_ns
+        except OSError:
+            fechas[ruta] = None
+    return fechas
+
+
+class VigilanteArchivos:
+    """Hilo que revisa periódicamente los mtime de los archivos y avisa si cambian"""
+
+    def __init__(self, obtener_fechas_cargadas, rutas, intervalo_segundos, al_cambiar):
+        self.obtener_fechas_cargadas = obtener_fechas_cargadas
+        self.rutas = list(rutas)
+        self.intervalo_segundos = intervalo_segundos
+        self.al_cambiar = al_cambiar
+        # Fechas de la última carga que falló: no se reintenta hasta que los archivos vuelvan a cambiar
+        self.fechas_fallidas = None
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        """Arrancar el hilo de revisión (una vez por proceso; los hilos no sobreviven a un fork)"""
+        if self.intervalo_segundos <= 0 or (self._hilo is not None and self._hilo.is_alive()):
+            return
+        self._hilo = threading.Thread(target=self._ciclo, name='vigilante-catalogos', daemon=True)
+        self._hilo.start()
+        logger.info(f"👀 Revisando cambios en catálogos cada {self.intervalo_segundos}s")
+
+    def registrar_fallo(self, fechas):
+        """Recordar las fechas de una carga fallida (None tras una carga exitosa)"""
+        self.fechas_fallidas = fechas
+
+    def detener(self):
+        """Detener el hilo de revisión"""
+        self._detener.set()
+
+    def _ciclo(self):
+        while not self._detener.wait(self.intervalo_segundos):
+            try:
+                actuales = fechas_modificacion(self.rutas)
+                if actuales != self.obtener_fechas_cargadas() and actuales != self.fechas_fallidas:
+                    logger.info("🔄 Cambio detectado en los archivos de catálogo")
+                    self.al_cambiar()
+            except Exception as e:
+                logger.error(f"❌ Error revisando archivos de catálogo: {e}")
@@ -0,0 +1,122 @@
+"""
+Snapshot binario del catálogo (productos + índices de búsqueda)
+
+Compilar (después de actualizar los JSON):
+    python snapshot.py
+
+Al iniciar, app.py deserializa el catálogo del snapshot en lugar de leer los
+JSON y reconstruir los índices. Si algún JSON, el código de indexación o la
+configuración cambiaron desde que se compiló, el snapshot se ignora y se
+cargan los JSON como siempre.
+
+El contenido es un pickle: solo se deben cargar snapshots generados por
+este mismo servidor.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import sys
+
+import almacen
+import analizador
+import contexto
+import dosis
+import faq
+import filtros
+import fusion
+import indice
+import normalizacion
+import trigramas
+
+logger = logging.getLogger(__name__)
+
+MAGIA = b'TIASNAP\n'
+FORMATO = 1
+
+# Módulos que definen la forma de los índices: si cambian, el snapshot ya no sirve
+MODULOS_INDICE = [indice, normalizacion, analizador, fusion, trigramas, almacen, contexto, dosis, faq, filtros]
+
+# app.py arma el catálogo (indexar_catalogo y sus claves); no se importa aquí porque importa este módulo
+ARCHIVOS_CODIGO = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')]
+
+
+def huella_archivo(ruta):
+    """SHA-256 del contenido de un archivo (None si no existe)"""
+    try:
+        with open(ruta, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def huella_codigo():
+    """Huella del código que construye los índices"""
+    rutas = [modulo.__file__ for modulo in MODULOS_INDICE] + ARCHIVOS_CODIGO
+    return hashlib.sha256(''.join(huella_archivo(ruta) or '' for ruta in rutas).encode()).hexdigest()
+
+
+def metadatos_snapshot(rutas, configuracion):
+    """Metadatos que deben coincidir para que un snapshot sea vigente"""
+    return {
+        'formato': FORMATO,
+        'python': f'{sys.version_info.major}.{sys.version_info.minor}',
+        'numpy': indice.np is not None,
+        'codigo': huella_codigo(),
+        'configuracion': configuracion,
+        'archivos': {ruta: huella_archivo(ruta) for ruta in rutas}
+    }
+
+
+def guardar_snapshot(ruta, catalogo, metadatos):
+    """Escribir el snapshot de forma atómica (archivo temporal + rename)"""
+    cabecera = json.dumps(metadatos, sort_keys=True).encode('utf-8')
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(MAGIA)
+        f.write(struct.pack('<I', len(cabecera)))
+        f.write(cabecera)
+        pickle.dump(catalogo, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporal, ruta)
+
+
+def cargar_snapshot(ruta, metadatos_esperados):
+    """Leer el snapshot y deserializar el catálogo, o None si no existe o está desactualizado"""
+    try:
+        with open(ruta, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+                if datos[:len(MAGIA)] != MAGIA:
+                    logger.warning(f"⚠️ {ruta} no es un snapshot de catálogo válido")
+                    return None
+
+                inicio = len(MAGIA) + 4
+                (largo,) = struct.unpack('<I', datos[len(MAGIA):inicio])
+                metadatos = json.loads(datos[inicio:inicio + largo].decode('utf-8'))
+                if metadatos != json.loads(json.dumps(metadatos_esperados)):
+                    logger.info(f"ℹ️ Snapshot {ruta} desactualizado, se cargan los JSON")
+                    return None
+
+                with memoryview(datos) as vista:
+                    return pickle.loads(vista[inicio + largo:])
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo leer el snapshot {ruta}: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    import app
+
+    if not app.RUTA_SNAPSHOT:
+        sys.exit('CATALOGO_SNAPSHOT está vacío: no hay ruta donde guardar el snapshot')
+
+    # Las huellas se toman antes de leer los JSON
+    metadatos = app.metadatos_catalogo()
+    catalogo = app.construir_catalogo()
+    guardar_snapshot(app.RUTA_SNAPSHOT, catalogo, metadatos)
+    logger.info(f"✅ Snapshot guardado en {app.RUTA_SNAPSHOT} ({os.path.getsize(app.RUTA_SNAPSHOT)} bytes)")
@@ -0,0 +1,105 @@
+# Similitud por trigramas de caracteres (al estilo de pg_trgm)
+from array import array
+
+# Similitud mínima para considerar que una palabra es un error de dedo de un término
+UMBRAL_PALABRA_SIMILAR = 0.4
+
+# Máximo de palabras de consulta cuya corrección se guarda en cache
+MAX_CACHE_SIMILARES = 4096
+
+
+def trigramas(texto):
+    """Obtener el conjunto de trigramas de un texto ya normalizado"""
+    resultado = set()
+    for palabra in texto.split():
+        # Igual que pg_trgm: dos espacios al inicio y uno al final de cada palabra
+        relleno = '  ' + palabra + ' '
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return frozenset(resultado)
+
+
+def aplanar_trigramas(campos):
+    """Trigramas de cada registro por campo ({campo: [conjunto por registro]}) en arreglos planos
+
+    Un vocabulario trigrama -> id compartido y, por campo, los ids ordenados de
+    cada registro en formato CSR (como los postings del índice invertido): al
+    consultar no se tocan objetos compartidos por registro.
+    """
+    vocabulario = {}
+    planos = {}
+    for campo, conjuntos in campos.items():
+        indptr = array('q', [0])
+        ids = array('i')
+        for conjunto in conjuntos:
+            ids.extend(sorted(vocabulario.setdefault(trigrama, len(vocabulario)) for trigrama in conjunto))
+            indptr.append(len(ids))
+        planos[campo] = {'indptr': indptr, 'ids': ids}
+    return {'vocabulario': vocabulario, **planos}
+
+
+def ids_trigramas(indice, conjunto):
+    """Ids de los trigramas de una consulta que existen en el vocabulario plano"""
+    vocabulario = indice['vocabulario']
+    return frozenset(vocabulario[trigrama] for trigrama in conjunto if trigrama in vocabulario)
+
+
+def cantidad_trigramas(plano, id_registro):
+    """Cantidad de trigramas de un registro en un campo plano"""
+    return plano['indptr'][id_registro + 1] - plano['indptr'][id_registro]
+
+
+def similitud_plana(ids_consulta, tamano_consulta, plano, id_registro):
+    """Similitud (trigramas compartidos / trigramas totales) entre la consulta y un registro de un campo plano"""
+    inicio, fin = plano['indptr'][id_registro], plano['indptr'][id_registro + 1]
+    if not tamano_consulta or inicio == fin:
+        return 0.0
+    compartidos = len(ids_consulta.intersection(plano['ids'][inicio:fin]))
+    return compartidos / (tamano_consulta + (fin - inicio) - compartidos)
+
+
+def construir_indice_trigramas(terminos):
+    """Construir el índice trigrama -> ids de términos del vocabulario"""
+    postings = {}
+    cantidades = array('H')
+
+    for id_termino, termino in enumerate(terminos):
+        conjunto = trigramas(termino)
+        cantidades.append(min(len(conjunto), 0xFFFF))
+        for trigrama in conjunto:
+            postings.setdefault(trigrama, array('i')).append(id_termino)
+
+    return {
+        'postings': postings,
+        'cantidades': cantidades,
+        'cache_similares': {}
+    }
+
+
+def terminos_similares(indice, palabra, umbral=UMBRAL_PALABRA_SIMILAR):
+    """Buscar ids de términos parecidos a la palabra (tolerante a errores de dedo)"""
+    cache = indice['cache_similares']
+    similares = cache.get(palabra)
+    if similares is not None:
+        return similares
+
+    conjunto = trigramas(palabra)
+    compartidos = {}
+    for trigrama in conjunto:
+        for id_termino in indice['postings'].get(trigrama, ()):
+            compartidos[id_termino] = compartidos.get(id_termino, 0) + 1
+
+    # Poda: con 'c' trigramas compartidos la similitud máxima es c / max(|a|, |b|)
+    minimo_compartidos = umbral * len(conjunto)
+    cantidades = indice['cantidades']
+    similares = []
+    for id_termino, cantidad in compartidos.items():
+        if cantidad < minimo_compartidos:
+            continue
+        similitud = cantidad / (len(conjunto) + cantidades[id_termino] - cantidad)
+        if similitud >= umbral:
+            similares.append((id_termino, similitud))
+
+    if len(cache) >= MAX_CACHE_SIMILARES:
+        cache.clear()
+    cache[palabra] = similares
+    return similares